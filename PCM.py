@@ -1,3 +1,4 @@
+import struct
 import wave
 
 
@@ -6,53 +7,221 @@ class PCM:
     class contains decoded raw PCM and relevant information which helps to covert PCM into .wav file.
     '''
 
+    # sample format: (sample width in bytes, float samples)
+    sample_formats = {
+        'u8': (1, False),
+        's16': (2, False),
+        's24': (3, False),
+        's32': (4, False),
+        'f32': (4, True),
+    }
+
     def __init__(self):
-        self.buffer = b''
+        self.buffer = bytearray()
         self.nchannels = 1
         self.sampwidth = 2  # bytes
+        self.float_format = False  # IEEE float samples instead of integers
         self.framerate = 16000  # sampling rate
         self.nframes = 0
         self.is_init = False
 
-    def set_params(self, nchannels, sampwidth, framerate):
+    def set_params(self, nchannels, sampwidth, framerate, float_format=False):
+        if float_format and sampwidth != 4:
+            raise ValueError("float samples should be 4 bytes wide")
+        if sampwidth not in (1, 2, 3, 4):
+            raise ValueError("sample width should be 1, 2, 3 or 4 bytes")
         self.nchannels = nchannels
         self.sampwidth = sampwidth
         self.framerate = framerate
+        self.float_format = float_format
+        self.is_init = True
 
-    def push(self, samples: list):
+    def push(self, samples, blocks=None, scale=1.0):
         '''
         save samples into buffer
-        samples: list which contains float type samples.
+        samples: float samples on 16-bit scale. Either a flat sequence of interleaved samples,
+        or shaped (blocks, nchannels, block_length) where each block holds the channels one after another.
+        blocks: if given, flat samples are made of that many blocks of channels one after another.
+        scale: factor bringing samples to 16-bit scale, 32768 for decoder output whose full scale is 1.0.
         '''
-        for sample in samples:
-            self.buffer+=float2bytes(sample)
+        shape = None if blocks is None else (blocks, self.nchannels, -1)
+        data = float2bytes(samples, self.sampwidth, self.float_format, shape, scale)
+        self.buffer += data
+        self.nframes += len(data) // (self.sampwidth * self.nchannels)
 
     def flush(self, wavfile, write_mode='wb'):
         '''
         flush buffer data into a .wav file, and empty the buffer.
         '''
-        print(">>> save decoding result: %s"%wavfile)
         if len(self.buffer) == 0:
             raise EmptyBufferError
-        with wave.open(wavfile, 'wb') as wav:
-            wav.setparams((self.nchannels, self.sampwidth,
-                           self.framerate, 0, 'NONE', 'NONE'))
-            wav.writeframes(self.buffer)
-        self.buffer = b''
-
-
-def float2bytes(value: float, bytes_length=2, byteorder='big') -> bytes:
-    if bytes_length == 2:
-        if value > 32767:
-            value = 32767
-        elif value < -32768:
-            value = -32768
-    elif bytes_length == 2:
-        if value > 127:
-            value = 127
-        elif value < -128:
-            value = -128
-    return int(value).to_bytes(bytes_length, byteorder=byteorder, signed=True)
+        if self.float_format:
+            # wave module only writes integer PCM.
+            with open(wavfile, write_mode) as wav:
+                wav.write(float_wav_header(self.nchannels, self.framerate, len(self.buffer)))
+                wav.write(self.buffer)
+        else:
+            with wave.open(wavfile, 'wb') as wav:
+                wav.setparams((self.nchannels, self.sampwidth,
+                               self.framerate, 0, 'NONE', 'NONE'))
+                wav.writeframes(self.buffer)
+        self.buffer = bytearray()
+        self.nframes = 0
+
+
+class RawSink(PCM):
+    '''
+    writes samples straight to a file or binary stream as raw interleaved little-endian PCM, e.g. s16le or f32le
+    with MP3File(sample_format='f32'), instead of keeping them for a .wav.
+    '''
+
+    def __init__(self, output):
+        '''
+        output: a file name, or a binary file object which is left open.
+        '''
+        super().__init__()
+        self._owned = isinstance(output, str)
+        self.output = open(output, 'wb') if self._owned else output
+
+    def push(self, samples, blocks=None, scale=1.0):
+        shape = None if blocks is None else (blocks, self.nchannels, -1)
+        data = float2bytes(samples, self.sampwidth, self.float_format, shape, scale)
+        self.output.write(data)
+        self.nframes += len(data) // (self.sampwidth * self.nchannels)
+
+    def close(self):
+        if self._owned:
+            self.output.close()
+        else:
+            self.output.flush()
+
+
+class ArraySink(PCM):
+    '''
+    keeps samples in a NumPy array of shape (length, nchannels), of the sample format's type: int16 for s16,
+    float32 normalized to [-1, 1] for f32 and so on. s24 has no NumPy type.
+    '''
+
+    def __init__(self, length=None):
+        '''
+        length: samples per channel the array is allocated for, grown when more come.
+        None lets MP3File count the samples to the end of the stream from the frame headers.
+        '''
+        super().__init__()
+        self.length = length
+        self._array = None
+
+    @property
+    def array(self):
+        '''
+        the samples pushed so far.
+        '''
+        if self._array is None:
+            return None
+        return self._array[:self.nframes]
+
+    def push(self, samples, blocks=None, scale=1.0):
+        import numpy as np
+
+        shape = None if blocks is None else (blocks, self.nchannels, -1)
+        data = float2bytes(samples, self.sampwidth, self.float_format, shape, scale)
+        frames = np.frombuffer(data, dtype=self._dtype()).reshape(-1, self.nchannels)
+        end = self.nframes + len(frames)
+        if self._array is None:
+            self._array = self._allocate(max(self.length or 0, end))
+        elif end > len(self._array):
+            self._array = self._grow(max(end, 2 * len(self._array)))
+        self._array[self.nframes:end] = frames
+        self.nframes = end
+
+    def _dtype(self) -> str:
+        if self.sampwidth == 3:
+            raise ValueError("24-bit samples can't be kept in a NumPy array")
+        if self.float_format:
+            return '<f4'
+        return 'u1' if self.sampwidth == 1 else '<i%d' % self.sampwidth
+
+    def _allocate(self, length: int):
+        import numpy as np
+
+        return np.zeros((length, self.nchannels), dtype=self._dtype())
+
+    def _grow(self, length: int):
+        array = self._allocate(length)
+        array[:self.nframes] = self._array[:self.nframes]
+        return array
+
+
+class NpySink(ArraySink):
+    '''
+    ArraySink whose array is a memory-mapped .npy file, allocated for length samples per channel when the first
+    samples come and filled in place. Samples beyond length are an error, rows never pushed stay zero.
+    '''
+
+    def __init__(self, filename: str, length=None):
+        super().__init__(length)
+        self.filename = filename
+
+    def _allocate(self, length: int):
+        import numpy as np
+
+        return np.lib.format.open_memmap(self.filename, mode='w+', dtype=self._dtype(),
+                                         shape=(length, self.nchannels))
+
+    def _grow(self, length: int):
+        raise ValueError("%s is allocated for %d samples per channel" % (self.filename, len(self._array)))
+
+    def close(self):
+        if self._array is not None:
+            self._array.flush()
+            self._array = None
+
+
+def float2bytes(samples, bytes_length=2, float_format=False, shape=None, scale=1.0) -> bytes:
+    '''
+    convert float samples on 16-bit scale into little-endian WAV sample bytes in one pass:
+    channel blocks are interleaved, samples are rescaled to the sample width, rounded and clipped.
+    8-bit samples are unsigned as WAV requires, float samples are normalized to [-1, 1].
+    shape: if given, samples are reshaped to it first, e.g. (blocks, nchannels, -1).
+    scale: samples are multiplied by it first, to bring them to 16-bit scale.
+    '''
+    # numpy is imported on first use, `import mp3` stays cheap for jobs which never produce PCM.
+    import numpy as np
+
+    samples = np.asarray(samples, dtype=np.float64)
+    if shape is not None:
+        samples = samples.reshape(shape)
+    if samples.ndim == 3:
+        # (blocks, nchannels, block_length) -> (blocks, block_length, nchannels)
+        samples = samples.transpose(0, 2, 1)
+    if float_format:
+        scaled = samples * (scale / 32768)
+        np.clip(scaled, -1, 1, out=scaled)
+        return scaled.astype('<f4').tobytes()
+
+    bits = bytes_length * 8
+    scaled = samples * (scale * 2.0 ** (bits - 16))
+    np.rint(scaled, out=scaled)
+    np.clip(scaled, -2 ** (bits - 1), 2 ** (bits - 1) - 1, out=scaled)
+    if bytes_length == 1:
+        return (scaled + 128).astype(np.uint8).tobytes()
+    if bytes_length == 3:
+        # keep the lower three bytes of little-endian int32
+        return scaled.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return scaled.astype('<i%d' % bytes_length).tobytes()
+
+
+def float_wav_header(nchannels, framerate, data_length) -> bytes:
+    '''
+    RIFF header of a WAVE_FORMAT_IEEE_FLOAT file with 32-bit samples.
+    '''
+    block_align = nchannels * 4
+    return b''.join([
+        b'RIFF', struct.pack('<I', 4 + 26 + 12 + 8 + data_length), b'WAVE',
+        b'fmt ', struct.pack('<IHHIIHHH', 18, 3, nchannels, framerate, framerate * block_align, block_align, 32, 0),
+        b'fact', struct.pack('<II', 4, data_length // block_align),
+        b'data', struct.pack('<I', data_length),
+    ])
 
 
 class EmptyBufferError(Exception):
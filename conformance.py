@@ -0,0 +1,146 @@
+"""
+conformance.py : checks the optimized decoding engines against the reference MainData.
+
+Every engine decodes the bundled test MP3s frame by frame. Each frame is compared with the
+reference output: max abs error, RMS error and SNR, on a full scale of 1.0.
+The compliance criteria of ISO/IEC 11172-4 are the pass/fail thresholds:
+- full accuracy: RMS error < 2^-15 / sqrt(12) and max abs error <= 2^-14
+- limited accuracy: RMS error < 2^-11 / sqrt(12)
+
+The reference output itself is pinned by golden checksums in test/golden.json:
+    python conformance.py                   # check every engine and the golden checksums
+    python conformance.py --update-golden   # rewrite test/golden.json from the reference
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import zlib
+
+import numpy as np
+
+from benchmark import ENGINES, TEST_DIR
+from mp3 import MP3File
+
+SONGS = ['noid3.mp3', 'seeusadness.mp3']
+GOLDEN_FILE = os.path.join(TEST_DIR, 'golden.json')
+GOLDEN_FRAMES = 24
+
+FULL_ACCURACY = {'rms': 2 ** -15 / math.sqrt(12), 'max_abs': 2 ** -14}
+LIMITED_ACCURACY = {'rms': 2 ** -11 / math.sqrt(12), 'max_abs': math.inf}
+
+
+def decode_frames(song: str, nframes: int, **kwargs) -> list:
+    '''
+    decoded frames of a song as float arrays of shape (samples, nchannels), full scale is 1.0.
+    kwargs are passed to MP3File, e.g. dtype or down_sample.
+    '''
+    mp3 = MP3File(os.path.join(TEST_DIR, song), sample_format='f32', **kwargs)
+    # all frames in one read, batched engines transform them together.
+    mp3.read_frames(nframes)
+    nchannels = mp3.PCM_buffer.nchannels
+    samples = np.frombuffer(mp3.PCM_buffer.buffer, dtype='<f4').astype(np.float64)
+    # a frame is 2 granules of 18 blocks of one PCM sample per synthesized subband.
+    frame_length = 36 * mp3.decoder_state.subbands
+    return list(samples.reshape(-1, frame_length, nchannels))
+
+
+def frame_errors(reference: np.ndarray, output: np.ndarray) -> dict:
+    '''
+    max abs error, RMS error and SNR in dB of one frame. SNR is inf when both are identical.
+    '''
+    if reference.shape != output.shape:
+        raise ValueError("frame shapes differ: %s and %s" % (reference.shape, output.shape))
+    error = output - reference
+    error_power = np.mean(error ** 2)
+    signal_power = np.mean(reference ** 2)
+    if error_power == 0:
+        snr = math.inf
+    elif signal_power == 0:
+        snr = -math.inf
+    else:
+        snr = 10 * math.log10(signal_power / error_power)
+    return {'max_abs': float(np.abs(error).max()), 'rms': math.sqrt(error_power), 'snr_db': snr}
+
+
+def accuracy(errors: list) -> str:
+    '''
+    'full', 'limited' or 'none': the compliance level every frame reaches.
+    '''
+    for level, limits in [('full', FULL_ACCURACY), ('limited', LIMITED_ACCURACY)]:
+        if all(e['rms'] < limits['rms'] and e['max_abs'] <= limits['max_abs'] for e in errors):
+            return level
+    return 'none'
+
+
+def compare_engine(song: str, engine: str, nframes: int, **kwargs) -> list:
+    '''
+    per-frame errors of an engine against the reference engine, both decoding with kwargs.
+    '''
+    reference = decode_frames(song, nframes, **kwargs)
+    output = decode_frames(song, nframes, **ENGINES[engine], **kwargs)
+    if len(output) != len(reference):
+        raise ValueError("%s decoded %d frames, reference %d" % (engine, len(output), len(reference)))
+    return [frame_errors(r, o) for r, o in zip(reference, output)]
+
+
+def checksums(frames: list) -> dict:
+    '''
+    compact fingerprint of decoded frames: CRC32 of every frame's 16-bit PCM, and SHA1 of them all.
+    16-bit samples hide float noise below 1 LSB, the per-frame CRCs locate the first frame that differs.
+    '''
+    pcm = [np.clip(np.rint(frame * 32768), -32768, 32767).astype('<i2').tobytes() for frame in frames]
+    return {
+        'frames': len(pcm),
+        'sha1': hashlib.sha1(b''.join(pcm)).hexdigest(),
+        'crc32': ['%08x' % zlib.crc32(data) for data in pcm],
+    }
+
+
+def load_golden() -> dict:
+    with open(GOLDEN_FILE) as f:
+        return json.load(f)
+
+
+def update_golden(nframes=GOLDEN_FRAMES):
+    golden = {song: checksums(decode_frames(song, nframes)) for song in SONGS}
+    with open(GOLDEN_FILE, 'w') as f:
+        json.dump(golden, f, indent=2)
+        f.write('\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="check the decoding engines against the reference decoder")
+    parser.add_argument("--frames", type=int, default=GOLDEN_FRAMES, help="frames to compare per song")
+    parser.add_argument("--update-golden", action='store_true',
+                        help="rewrite the golden checksums from the reference decoder")
+    args = parser.parse_args()
+
+    if args.update_golden:
+        update_golden(args.frames)
+        print(">>> golden checksums saved: %s" % GOLDEN_FILE)
+        sys.exit(0)
+
+    failed = False
+    golden = load_golden()
+    for song in SONGS:
+        expected = golden[song]
+        actual = checksums(decode_frames(song, expected['frames']))
+        status = 'ok' if actual == expected else 'MISMATCH'
+        failed |= actual != expected
+        print('%-18s golden checksums: %s' % (song, status))
+
+    print('%-18s %-20s %-9s %12s %12s %10s' % ('song', 'engine', 'accuracy', 'max abs', 'rms', 'min snr'))
+    for song in SONGS:
+        for engine in ENGINES:
+            if engine == 'reference':
+                continue
+            errors = compare_engine(song, engine, args.frames)
+            level = accuracy(errors)
+            failed |= level != 'full'
+            print('%-18s %-20s %-9s %12.3e %12.3e %10.1f' % (
+                song, engine, level, max(e['max_abs'] for e in errors), max(e['rms'] for e in errors),
+                min(e['snr_db'] for e in errors)))
+    sys.exit(1 if failed else 0)
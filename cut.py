@@ -0,0 +1,206 @@
+'''
+frame accurate cutting and concatenation of MP3 streams, copying frames as raw bytes without decoding them.
+
+The main data of a frame may begin in the frames before it (the bit reservoir, main_data_begin bytes back),
+so the first frame of a cut can't simply be copied. Its main data and the bytes the next frame keeps in the
+reservoir are moved into its own slot, whose bitrate is raised until they fit, with main_data_begin 0.
+The frames after it find their reservoir where they expect it and are copied as they are.
+A Xing, Info or VBRI frame leading the stream describes the whole of it (frame count, size, seek table),
+it is left out of every cut.
+
+usage: python cut.py song.mp3 out.mp3 [--start FRAME] [--stop FRAME]
+'''
+import argparse
+
+from activity import side_info_frames
+from header import ChannelModeInfo, LayerInfo, MPEGAudioVersionInfo, Header
+
+# the reservoir reaches at most this many bytes back, main_data_begin has 9 bits
+MAX_MAIN_DATA_BEGIN = 511
+# boundary frames tried before giving up on a cut point
+MAX_REPACKED_FRAMES = 4
+# tags of the encoder's frame leading a stream, after the side info, or 32 bytes after the header for VBRI
+VBR_TAGS = (b'Xing', b'Info')
+VBRI_TAG = b'VBRI'
+
+
+class MP3Stream(object):
+    '''
+    frames of an MPEG 1 Layer III file, and where the main data of every frame is in the reservoir.
+    Reservoir positions count the bytes of the slots (frame minus header, CRC and side info) before them.
+    '''
+
+    def __init__(self, mp3_file: str):
+        with open(mp3_file, 'rb') as audio:
+            self.data = audio.read()
+        self.frames = list(side_info_frames(mp3_file))
+        if any(header.MPEG_version != MPEGAudioVersionInfo.ONE or header.layer != LayerInfo.III
+               for _, header, _ in self.frames):
+            raise ValueError("only MPEG 1 Layer III streams can be cut")
+        # where the slot of every frame starts in the reservoir, and where its main data starts
+        self.slot_start = []
+        self.data_start = []
+        slots = []
+        position = 0
+        for offset, header, side_info in self.frames:
+            slot = self.data[offset + _head_length(header):offset + header.frame_size]
+            slots.append(slot)
+            self.slot_start.append(position)
+            self.data_start.append(position - side_info.main_data_begin)
+            position += len(slot)
+        self.slot_start.append(position)
+        self.data_start.append(position)
+        self.reservoir = b''.join(slots)
+        # frame 0 is the encoder's tag frame, not audio
+        self.tag_frame = bool(self.frames) and _is_tag_frame(self.data, *self.frames[0][:2])
+
+    def __len__(self):
+        return len(self.frames)
+
+    def copy(self, start: int, stop: int) -> bytes:
+        '''
+        frames start .. stop as a stream of their own: the first ones repacked, the others as they are,
+        without the tag frame.
+        '''
+        if start == 0 and self.tag_frame:
+            start = 1
+        if start >= stop:
+            return b''
+        repacked = self._repack(start, stop)
+        first = start + len(repacked)
+        if first == stop:
+            return b''.join(repacked)
+        offset, _, _ = self.frames[first]
+        end_offset, end_header, _ = self.frames[stop - 1]
+        return b''.join(repacked) + self.data[offset:end_offset + end_header.frame_size]
+
+    def _repack(self, start: int, stop: int) -> list:
+        # the fewest frames from start whose slots take their main data and the next frame's reservoir
+        if self.frames[start][2].main_data_begin == 0:
+            return []
+        for count in range(1, min(MAX_REPACKED_FRAMES, stop - start) + 1):
+            frames = self._repack_frames(start, start + count, stop)
+            if frames is not None:
+                return frames
+        raise ValueError("frame %d can't be repacked" % start)
+
+    def _repack_frames(self, start: int, end: int, stop: int) -> list:
+        '''
+        frames start .. end-1 with main_data_begin counted from the start of the cut, None if they can't hold it.
+        Their slots take the main data of those frames, then filler, then the reservoir of frame end.
+        '''
+        base = self.data_start[start]
+        # the reservoir of frame end, none if the cut stops before it
+        tail = self.slot_start[end] if end < stop else self.data_start[end]
+        body = self.reservoir[base:self.data_start[end]]
+        reservoir = self.reservoir[self.data_start[end]:tail]
+        frames = []
+        position = 0
+        for num in range(start, end):
+            header = self.frames[num][1]
+            main_data_begin = position - (self.data_start[num] - base)
+            if main_data_begin > MAX_MAIN_DATA_BEGIN:
+                return None
+            need = (self.data_start[num + 1] if num + 1 < end else base + len(body) + len(reservoir)) - base
+            index = _bitrate_index(header, _head_length(header) + need - position)
+            if index is None:
+                return None
+            frames.append((num, index, main_data_begin))
+            position += _frame_size(header, index) - _head_length(header)
+        filler = bytes(position - len(body) - len(reservoir))
+        slots = body + filler + reservoir
+        output = []
+        position = 0
+        for num, index, main_data_begin in frames:
+            offset, header, _ = self.frames[num]
+            head = bytearray(self.data[offset:offset + _head_length(header)])
+            # new bitrate, no padding
+            head[2] = (index << 4) | (head[2] & 0x0D)
+            side = 6 if header.protection == '0' else 4
+            head[side] = main_data_begin >> 1
+            head[side + 1] = ((main_data_begin & 1) << 7) | (head[side + 1] & 0x7F)
+            if header.protection == '0':
+                head[4:6] = _crc16(head[2:4] + head[6:]).to_bytes(2, byteorder='big')
+            size = _frame_size(header, index) - len(head)
+            output.append(bytes(head) + slots[position:position + size])
+            position += size
+        return output
+
+
+def cut(mp3_file: str, output: str, start=0, stop=None):
+    '''
+    write frames start .. stop (the end if None) of mp3_file to output, see concat.
+    '''
+    concat([(mp3_file, start, stop)], output)
+
+
+def concat(segments: list, output: str):
+    '''
+    write the frames of segments one after another to output. A segment is a file name, or a tuple
+    (file name, first frame, frame after the last, None for the end). Every segment starts with an empty
+    bit reservoir, the IMDCT overlap at the joins isn't smoothed. ID3 tags and the Xing, Info or VBRI frames
+    aren't copied. Segments should have the same sampling rate and number of channels.
+    '''
+    chunks = []
+    sampling_rates = set()
+    mono = set()
+    for segment in segments:
+        mp3_file, start, stop = (segment, 0, None) if isinstance(segment, str) else segment
+        stream = MP3Stream(mp3_file)
+        stop = len(stream) if stop is None else min(stop, len(stream))
+        if not 0 <= start <= stop:
+            raise ValueError("segment %s should have 0 <= start <= stop" % (segment,))
+        sampling_rates.update(header.sampling_rate_frequency for _, header, _ in stream.frames[start:stop])
+        mono.update(header.channel_mode == ChannelModeInfo.MONO for _, header, _ in stream.frames[start:stop])
+        chunks.append(stream.copy(start, stop))
+    if len(sampling_rates) > 1:
+        raise ValueError("segments should have the same sampling rate")
+    if len(mono) > 1:
+        raise ValueError("segments should have the same number of channels")
+    with open(output, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+
+
+def _head_length(header: Header) -> int:
+    # header, CRC and side info
+    side_info_length = 17 if header.channel_mode == ChannelModeInfo.MONO else 32
+    return 4 + (2 if header.protection == '0' else 0) + side_info_length
+
+
+def _is_tag_frame(data: bytes, offset: int, header: Header) -> bool:
+    tag_offset = offset + _head_length(header)
+    return (data[tag_offset:tag_offset + 4] in VBR_TAGS
+            or data[offset + 36:offset + 40] == VBRI_TAG)
+
+
+def _frame_size(header: Header, index: int) -> int:
+    return 144 * Header.bitrate_table_V1[LayerInfo.III][index] // header.sampling_rate_frequency
+
+
+def _bitrate_index(header: Header, size: int):
+    # the lowest bitrate whose unpadded frames are at least size bytes
+    for index in range(1, 15):
+        if _frame_size(header, index) >= size:
+            return index
+    return None
+
+
+def _crc16(data: bytes) -> int:
+    # CRC-16 of protected frames, polynomial 0x8005
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x8005 if crc & 0x8000 else crc << 1) & 0xFFFF
+    return crc
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("mp3file", help="the MP3's file path")
+    parser.add_argument("output", help="the cut MP3's file path")
+    parser.add_argument("--start", type=int, default=0, help="first frame, counted from 0")
+    parser.add_argument("--stop", type=int, default=None, help="frame after the last one, the end by default")
+    args = parser.parse_args()
+    cut(args.mp3file, args.output, args.start, args.stop)
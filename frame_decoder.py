@@ -0,0 +1,74 @@
+'''
+FrameDecoder: decodes the main data of one frame after another with the same MainData object and buffers.
+'''
+from backends import backend_class, main_data_class
+from header import Header
+from main_data import DecoderState, MainData, zero_fill
+from side_info import SideInfo
+
+
+class FrameDecoder(object):
+    """
+    long-lived decoder of the main data of frames, e.g. one per worker decoding file after file.
+
+    Every frame is decoded in place by the same MainData into the buffers allocated for the first one:
+    the frequency lines, xr, IMDCT samples and PCM of the previous frame are written again, and the IMDCT
+    overlap and synthesis V FIFO stay in state.
+    """
+
+    def __init__(self, down_sample=1, downmix=None, backend='reference', dtype=None, stats=None):
+        '''
+        down_sample, downmix, backend and dtype: see MP3File. stats: None or a DecodeStats timing every stage.
+        '''
+        if down_sample not in MainData.down_sample_subbands:
+            raise ValueError("down_sample should be one of %s" % list(MainData.down_sample_subbands))
+        if downmix not in (None, 'mono'):
+            raise ValueError("downmix should be None or 'mono'")
+        self.main_data_class = main_data_class(backend)
+        if dtype is not None and not issubclass(self.main_data_class, backend_class('numpy')):
+            raise ValueError("dtype needs the numpy or accelerated backend")
+        self.backend = backend
+        self.down_sample = down_sample
+        self.downmix = downmix
+        self.dtype = dtype
+        self.stats = stats
+        # IMDCT overlap and synthesis FIFO, carried from every frame to the next.
+        self.state = DecoderState(MainData.down_sample_subbands[down_sample])
+        # lists and arrays of the stages by name, filled again by every frame, see MainData.buffers
+        self.buffers = {}
+        # the MainData of the last frame decoded, None before the first one
+        self.frame = None
+
+    def decode(self, header: Header, side_info: SideInfo, bytes_str: str):
+        '''
+        decode the main data of the next frame, returns its pcm_output.
+        It is a buffer the next decode writes again: copy it to keep it.
+        '''
+        if self.frame is None:
+            self.frame = self._main_data(header, side_info, bytes_str, buffers=self.buffers)
+        else:
+            self.frame.stats = self.stats
+            self.frame.decode(header, side_info, bytes_str)
+        return self.frame.pcm_output
+
+    def spectra(self, header: Header, side_info: SideInfo, bytes_str: str) -> MainData:
+        '''
+        a new MainData of the next frame decoded up to its spectral stages, whose transform stages run later,
+        e.g. in a batch. It is not reused and has buffers of its own, so that any number of them wait at once.
+        '''
+        return self._main_data(header, side_info, bytes_str, transform=False)
+
+    def reset(self):
+        '''
+        forget the overlap and FIFO of the previous frames, before decoding another stream.
+        They are zeroed in place, as are the buffers.
+        '''
+        self.state.reset()
+        for buffer in self.buffers.values():
+            zero_fill(buffer)
+
+    def _main_data(self, header: Header, side_info: SideInfo, bytes_str: str, transform=True,
+                   buffers: dict = None) -> MainData:
+        kwargs = {} if self.dtype is None else {'dtype': self.dtype}
+        return self.main_data_class(header, side_info, bytes_str, self.down_sample, self.downmix,
+                                    self.stats, self.state, transform=transform, buffers=buffers, **kwargs)
@@ -1,8 +1,6 @@
 import json
 from enum import Enum, unique
-from pprint import pprint
-
-from utils.bit import Bit
+from functools import lru_cache
 
 
 @unique
@@ -75,147 +73,108 @@ class Header(object):
                                     11 - CCIT J.17
     """
 
+    # tables below are indexed by the integer value of the header field.
+    versions = (MPEGAudioVersionInfo.TWO_POINT_FIVE, MPEGAudioVersionInfo.RESERVED,
+                MPEGAudioVersionInfo.TWO, MPEGAudioVersionInfo.ONE)
+    layers = (LayerInfo.RESERVED, LayerInfo.III, LayerInfo.II, LayerInfo.I)
+    channel_modes = (ChannelModeInfo.STEREO, ChannelModeInfo.JOINT_STEREO,
+                     ChannelModeInfo.DUAL_CHANNEL, ChannelModeInfo.MONO)
+
+    # bitrate index 0 (free format) and 15 (bad) are not supported.
     bitrate_table_V1 = {
         # V1 MPEG Version 1
-        LayerInfo.I: {
-            '0001': 32000,
-            '0010': 64000,
-            '0011': 96000,
-            '0100': 128000,
-            '0101': 160000,
-            '0110': 192000,
-            '0111': 224000,
-            '1000': 256000,
-            '1001': 288000,
-            '1010': 320000,
-            '1011': 352000,
-            '1100': 384000,
-            '1101': 416000,
-            '1110': 448000,
-        },
-        LayerInfo.II: {
-            '0001': 32000,
-            '0010': 48000,
-            '0011': 56000,
-            '0100': 64000,
-            '0101': 80000,
-            '0110': 96000,
-            '0111': 112000,
-            '1000': 128000,
-            '1001': 160000,
-            '1010': 192000,
-            '1011': 224000,
-            '1100': 256000,
-            '1101': 320000,
-            '1110': 384000,
-        },
-        LayerInfo.III: {
-            '0001': 32000,
-            '0010': 40000,
-            '0011': 48000,
-            '0100': 56000,
-            '0101': 64000,
-            '0110': 80000,
-            '0111': 96000,
-            '1000': 112000,
-            '1001': 128000,
-            '1010': 160000,
-            '1011': 192000,
-            '1100': 224000,
-            '1101': 256000,
-            '1110': 320000,
-        }
+        LayerInfo.I: (None, 32000, 64000, 96000, 128000, 160000, 192000, 224000,
+                      256000, 288000, 320000, 352000, 384000, 416000, 448000, None),
+        LayerInfo.II: (None, 32000, 48000, 56000, 64000, 80000, 96000, 112000,
+                       128000, 160000, 192000, 224000, 256000, 320000, 384000, None),
+        LayerInfo.III: (None, 32000, 40000, 48000, 56000, 64000, 80000, 96000,
+                        112000, 128000, 160000, 192000, 224000, 256000, 320000, None),
+    }
+
+    bitrate_table_V2 = {
+        # V2 MPEG Version 2 and 2.5
+        LayerInfo.I: (None, 32000, 48000, 56000, 64000, 80000, 96000, 112000,
+                      128000, 144000, 160000, 176000, 192000, 224000, 256000, None),
+        LayerInfo.II: (None, 8000, 16000, 24000, 32000, 40000, 48000, 56000,
+                       64000, 80000, 96000, 112000, 128000, 144000, 160000, None),
+        LayerInfo.III: (None, 8000, 16000, 24000, 32000, 40000, 48000, 56000,
+                        64000, 80000, 96000, 112000, 128000, 144000, 160000, None),
     }
 
     sampling_rate_frequency_table = {
-        MPEGAudioVersionInfo.ONE: {
-            '00': 44100,
-            '01': 48000,
-            '10': 32000,
-        },
-        MPEGAudioVersionInfo.TWO: {
-            '00': 22050,
-            '01': 24000,
-            '10': 16000,
-        },
-        MPEGAudioVersionInfo.TWO_POINT_FIVE: {
-            '00': 11025,
-            '01': 12000,
-            '10': 8000,
-        },
+        MPEGAudioVersionInfo.ONE: (44100, 48000, 32000, None),
+        MPEGAudioVersionInfo.TWO: (22050, 24000, 16000, None),
+        MPEGAudioVersionInfo.TWO_POINT_FIVE: (11025, 12000, 8000, None),
     }
 
+    # samples per frame. Layer III of MPEG 2 and 2.5 only contains one granule.
+    samples_per_frame_table = {
+        LayerInfo.I: 384,
+        LayerInfo.II: 1152,
+        LayerInfo.III: 1152,
+    }
+
+    # bytes per slot, and frame size in slots per bit/s of bitrate over the sampling rate
     padding_table = {
         LayerInfo.I: 4,
         LayerInfo.II: 1,
         LayerInfo.III: 1,
     }
+    slots_factor_table = {
+        LayerInfo.I: 12,
+        LayerInfo.II: 144,
+        LayerInfo.III: 144,
+    }
 
     '''
     The emphasis indication is here to tell the decoder that the file must be de-emphasized, 
     ie the decoder must 're-equalize' the sound after a Dolby-like noise supression. It is rarely used.
     '''
-    emphasis_table = {
-        "00": "none",
-        "01": "50 / 15 ms",
-        "10": "reserved",
-        "11": "CCIT J.17"
-    }
-
-    def __init__(self, bytes_str:str):
-        self._bits = Bit(bytes_str)
-        self.frame_sync = self._bits.read(11)
-        version = self._bits.read(2)
-
-        valid_encode = False
-        for ver in MPEGAudioVersionInfo:
-            if ver.value == version:
-                self.MPEG_version = ver
-                valid_encode = True
-                break
-        if not valid_encode:
-            raise InvalidEncodingError
-
-        valid_encode = False
-        layer = self._bits.read(2)
-        for lay in LayerInfo:
-            if lay.value == layer:
-                self.layer = lay
-                valid_encode = True
-                break
-        if not valid_encode:
+    emphasis_table = ("none", "50 / 15 ms", "reserved", "CCIT J.17")
+
+    def __init__(self, bytes_str):
+        '''
+        bytes_str: the 32 header bits, either as a binary string or as an integer.
+        Use parse_header() for headers of a stream, which shares one Header per distinct header word.
+        '''
+        word = int(bytes_str, 2) if isinstance(bytes_str, str) else bytes_str
+        self.frame_sync = format(word >> 21, '011b')
+        self.MPEG_version = self.versions[(word >> 19) & 0b11]
+        self.layer = self.layers[(word >> 17) & 0b11]
+        if self.MPEG_version == MPEGAudioVersionInfo.RESERVED or self.layer == LayerInfo.RESERVED:
             raise InvalidEncodingError
 
-        self.protection = self._bits.read()
-        bitrate = self._bits.read(4)
-        self.bitrate = self.bitrate_table_V1[self.layer][bitrate]
-        frequency = self._bits.read(2)
-        self.sampling_rate_frequency = self.sampling_rate_frequency_table[self.MPEG_version][frequency]
-        self.padding = self._bits.read()
-        self.private = self._bits.read()  # Private bit. This one is only informative.
-
-        valid_encode = False
-        mode = self._bits.read(2)
-        for channel in ChannelModeInfo:
-            if channel.value == mode:
-                self.channel_mode = channel
-                valid_encode = True
-                break
-        if not valid_encode:
+        self.protection = str((word >> 16) & 1)  # '0' means the header is followed by 16 bits CRC.
+        lsf = self.MPEG_version != MPEGAudioVersionInfo.ONE  # low sampling frequencies, MPEG 2 and 2.5
+        bitrate_table = self.bitrate_table_V2 if lsf else self.bitrate_table_V1
+        self.bitrate = bitrate_table[self.layer][(word >> 12) & 0b1111]
+        self.sampling_rate_frequency = self.sampling_rate_frequency_table[self.MPEG_version][(word >> 10) & 0b11]
+        if self.bitrate is None or self.sampling_rate_frequency is None:
             raise InvalidEncodingError
+        self.padding = str((word >> 9) & 1)
+        self.private = str((word >> 8) & 1)  # Private bit. This one is only informative.
+        self.channel_mode = self.channel_modes[(word >> 6) & 0b11]
 
         # TODO: support mode extension (Only used in Joint stereo)
-        self.mode_extension = self._bits.read(2)
-        right = self._bits.read()
-        self.copyright = True if right == '1' else False
-        ori = self._bits.read()
-        self.original = True if ori == '1' else False
-        emphasis = self._bits.read(2)
-        self.emphasis = self.emphasis_table[emphasis]
-
-        # calculate the frame size in bytes
-        self.frame_size = int(144 * (self.bitrate / self.sampling_rate_frequency)
-                              + (int(self.padding, 2) * self.padding_table[self.layer]))
+        self.mode_extension = format((word >> 4) & 0b11, '02b')
+        self.copyright = bool((word >> 3) & 1)
+        self.original = bool((word >> 2) & 1)
+        self.emphasis = self.emphasis_table[word & 0b11]
+
+        # calculate the frame size in bytes, Layer III frames of MPEG 2 and 2.5 hold half the samples
+        slots_factor = self.slots_factor_table[self.layer]
+        self.samples_per_frame = self.samples_per_frame_table[self.layer]
+        if self.layer == LayerInfo.III and lsf:
+            slots_factor //= 2
+            self.samples_per_frame //= 2
+        self.frame_size = ((slots_factor * self.bitrate // self.sampling_rate_frequency + int(self.padding))
+                           * self.padding_table[self.layer])
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError("Header is immutable, it is shared by all frames with the same header word.")
+        super().__setattr__(name, value)
 
     def __str__(self):
         return json.dumps({
@@ -225,4 +184,13 @@ class Header(object):
             'sampling rate frequency':self.sampling_rate_frequency,
             'bitrate':self.bitrate,
             'mode extension':self.mode_extension
-        })
\ No newline at end of file
+        })
+
+
+@lru_cache(maxsize=256)
+def parse_header(word: int) -> Header:
+    '''
+    parse a 32-bit header word. Frame headers of a stream only differ in a few bits (mostly padding),
+    so after the first frames this is a single cache lookup.
+    '''
+    return Header(word)
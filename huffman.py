@@ -20,7 +20,10 @@ To further increase compression, the 15 tables are paired with another parameter
 
 """
 
+import logging
+
 from utils.bit import Bit
+from utils.log import huffman_logger
 
 HUFFMAN_TABLE = [
     # 1
@@ -396,6 +399,68 @@ def decode_quadruples(bits: Bit, table_num: int) -> (int, int, int, int):
         y = -y
     return v, w, x, y
 
+def decode_big_values_run(bits: Bit, table_num: int, lines: list, start: int, end: int):
+    """
+    decode_big_values_run : decode the pairs of lines[start:end], all coded with the same table.
+    The table is looked up once. Table 0 codes no bits, its lines are zero.
+    """
+    table, tree_length, linbits = HUFFMAN_TABLE_INFO[table_num]
+    if tree_length == 0:
+        lines[start:end] = [0.0] * (end - start)
+        return
+    read = bits.read
+    if linbits == 0:
+        for i in range(start, end, 2):
+            x, y = traverse_table(table, bits)
+            if x != 0 and read(1) == '1':
+                x = -x
+            if y != 0 and read(1) == '1':
+                y = -y
+            lines[i] = float(x)
+            lines[i + 1] = float(y)
+    else:
+        read_as_int = bits.read_as_int
+        for i in range(start, end, 2):
+            x, y = traverse_table(table, bits)
+            if x == 15:
+                x += read_as_int(linbits)
+            if x != 0 and read(1) == '1':
+                x = -x
+            if y == 15:
+                y += read_as_int(linbits)
+            if y != 0 and read(1) == '1':
+                y = -y
+            lines[i] = float(x)
+            lines[i + 1] = float(y)
+
+
+def decode_count1_run(bits: Bit, table_num: int, lines: list, start: int, end_bit: int, stop=576) -> int:
+    """
+    decode_count1_run : decode quadruples into lines from start on, until the bits of the channel
+    end at end_bit or the lines up to stop are decoded. A quadruple reaching past end_bit is discarded.
+    returns the index after the last decoded line.
+    """
+    table = HUFFMAN_TABLE_INFO[table_num][0]
+    read = bits.read
+    end_bit = min(end_bit, bits.get_length())
+    i = start
+    while i < stop and i + 4 <= 576 and bits.get_pointer() < end_bit:
+        try:
+            _, y = traverse_table(table, bits)
+            quad = [(y >> 3) & 1, (y >> 2) & 1, (y >> 1) & 1, y & 1]
+            for k in range(4):
+                if quad[k] != 0 and read(1) == '1':
+                    quad[k] = -quad[k]
+        except IndexError:
+            # the main data ends within the quadruple.
+            break
+        if bits.get_pointer() > end_bit:
+            break
+        lines[i:i + 4] = [float(v) for v in quad]
+        i += 4
+    return i
+
+
 def traverse_two(table: map, bits: Bit, table_max: int) -> (int, int):
     """
     traverse_two : let's try going off the c++ code now
@@ -406,8 +471,8 @@ def traverse_two(table: map, bits: Bit, table_max: int) -> (int, int):
             i = 2 * table_max * row + 2 * column
             value = table[i]
             size = table[i + 1]
-            if size > 32:
-                print('size: {}, row: {}, column: {}, table: {}'.format(size, row, column, table))
+            if size > 32 and huffman_logger.isEnabledFor(logging.DEBUG):
+                huffman_logger.debug('size: %d, row: %d, column: %d, table: %s', size, row, column, table)
             if value >> (32 - size) == bitnum >> (32 - size):
                 bits.set_pointer(bits.get_pointer() - (32 - size))
                 return (row, column)
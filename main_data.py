@@ -1,13 +1,14 @@
+import logging
 import math
-import numpy as np
+from functools import lru_cache
 
 from utils import sythesis_coefficients
 from header import Header, ChannelModeInfo
-from huffman import decode_quadruples, decode_big_values
+from huffman import decode_big_values_run, decode_count1_run
 from side_info import SideInfo, BlockTypeInfo
 from utils.bit import Bit
-
-DEBUG = True
+from utils.log import huffman_logger, synthesis_logger
+from utils.stats import DecodeStats
 
 
 class MainData:
@@ -44,26 +45,86 @@ class MainData:
         },
     }
 
-    def __init__(self, header: Header, side_info: SideInfo, bytes_str: str):
+    # number of synthesized subbands for each down sampling factor
+    down_sample_subbands = {1: 32, 2: 16, 4: 8}
+
+    def __init__(self, header: Header, side_info: SideInfo, bytes_str: str, down_sample=1, downmix=None,
+                 stats: DecodeStats = None, state: 'DecoderState' = None, transform=True, buffers: dict = None):
+        '''
+        down_sample: 1, 2 or 4. Synthesize only the lower 32/down_sample subbands, which directly
+        produces PCM at 1/down_sample of the original sampling rate.
+        downmix: None or 'mono'. 'mono' averages both channels before IMDCT, so only one channel
+        is transformed and synthesized.
+        stats: if given, the time of every decoding stage is added to it.
+        state: the DecoderState left by the previous frame of the stream, a fresh one if None.
+        transform: False stops after the spectral stages, the transform stages are run later,
+        e.g. by batch_transform of main_data_numpy.
+        buffers: where the stages keep the lists and arrays they write, by name. The frames decoded with the
+        same dict fill them again in place, see FrameDecoder. A new dict if None.
+        '''
+        if down_sample not in self.down_sample_subbands:
+            raise ValueError("down_sample should be one of %s" % list(self.down_sample_subbands))
+        if downmix not in (None, 'mono'):
+            raise ValueError("downmix should be None or 'mono'")
+        self.down_sample = down_sample
+        self.subbands = self.down_sample_subbands[down_sample]
+        self.downmix = downmix
+        self.state = DecoderState(self.subbands) if state is None else state
+        if self.state.subbands != self.subbands:
+            raise ValueError("decoder state is for %d subbands" % self.state.subbands)
+        self.stats = stats
+        self.buffers = {} if buffers is None else buffers
+        # scale factors of both granules and channels, 22 long bands and 13 short bands of 3 windows,
+        # filled in place by every frame decoded, see unpack_scale_factors.
+        self.scalefac_l = [[[0] * 22 for _ in range(2)] for _ in range(2)]
+        self.scalefac_s = [[[[0] * 3 for _ in range(13)] for _ in range(2)] for _ in range(2)]
+        self.part3_bounds = [[(0, 0)] * 2 for _ in range(2)]
+        self.decode(header, side_info, bytes_str, transform)
+
+    def decode(self, header: Header, side_info: SideInfo, bytes_str: str, transform=True):
+        '''
+        decode the main data of a frame. Called again with the next frame of the stream, the same
+        MainData decodes it too, reusing what it allocated, see FrameDecoder.
+        '''
         self._bits = Bit(bytes_str)
         self.header = header
         self.side_info = side_info
         self.channel_num = 1 if header.channel_mode == ChannelModeInfo.MONO else 2
+        self.huffman_symbols = 0
+        self.bits_consumed = 0
 
-        if DEBUG:
-            print("- main data bits length:", self._bits.get_length())
-        self.unpack_scale_factors()
-        if DEBUG:
-            print("- main data bits pointer:", self._bits.get_pointer())
-        self.unpack_huffman()
-        self.requantization()
-        self.reorder()
-        self.aliasing_reduction()
-        self.IMDCT()
+        if huffman_logger.isEnabledFor(logging.DEBUG):
+            huffman_logger.debug("- main data bits length: %d", self._bits.get_length())
+        self.run_stages(self.stages() if transform else self.spectral_stages())
+
+    def run_stages(self, stages: list):
+        for stage in stages:
+            if self.stats is None:
+                stage()
+            else:
+                self.stats.time_stage(stage)
+
+    def stages(self) -> list:
+        '''
+        decoding stages in order, from main data bits to PCM.
+        '''
+        return self.spectral_stages() + self.transform_stages()
+
+    def spectral_stages(self) -> list:
+        '''
+        stages from main data bits to the requantized frequency lines in xr. They only depend on this frame.
+        '''
+        stages = [self.unpack_scale_factors, self.unpack_huffman, self.requantization, self.reorder]
+        if self.downmix == 'mono':
+            stages.append(self.downmix_to_mono)
+        return stages
 
+    def transform_stages(self) -> list:
+        '''
+        stages from xr to PCM. They carry the IMDCT overlap and synthesis FIFO in self.state over to the next frame.
+        '''
         # Finally we reach time domain!
-        self.frequency_inversion()
-        self.synthesis()
+        return [self.aliasing_reduction, self.IMDCT, self.frequency_inversion, self.synthesis]
 
     def unpack_scale_factors(self):
         """
@@ -71,72 +132,52 @@ class MainData:
 
         unpack_scale_factors : use the side information to determine how many bits
         to read for each scale factor band. the side information will also tell us
-        whether or not scale factors are shared between granules for any bands
+        whether or not scale factors are shared between granules for any bands.
+
+        The bands and bit widths to read come from a cached plan of runs (see scale_factor_plan),
+        each run is one read of all its factors. Scale factors of bands which aren't transmitted are zero.
+
+        The main data holds the scale factors (part 2) and Huffman codes (part 3) of every channel one
+        after another, part2_3_length bits per channel. The bit range of every part 3 is saved in
+        part3_bounds for unpack_huffman.
         """
-        self.scalefac_l = [0] * 2
-        self.scalefac_s = [0] * 2
-        # i: granule; j: channel
         for gran in range(0, 2):
             granule = self.side_info.granules[gran]
-            self.scalefac_l[gran] = [0] * 2
-            self.scalefac_s[gran] = [0] * 2
+            self.part3_bounds[gran][:] = _NO_PART3
             for chan in range(0, self.channel_num):
                 channel = granule.channels[chan]
-                slen1 = self.scalefac_sizes[channel.scalefac_compress][0]
-                slen2 = self.scalefac_sizes[channel.scalefac_compress][1]
-                self.scalefac_l[gran][chan] = [0] * 22
-                self.scalefac_s[gran][chan] = [0] * 13
-                if channel.windows_switching_flag and channel.block_type == BlockTypeInfo.THREE_SHORT_WINDOWS:
-                    if channel.mixed_block_flag:
-                        # mixed blocks & short blocks 17 slen1 + 18 slen2 factors
-                        for k in range(0, 8):
-                            self.scalefac_l[gran][chan][k] = self._bits.read_as_int(slen1)
-                        for k in range(3, 6):
-                            self.scalefac_s[gran][chan][k] = [0] * 3
-                            for sfb in range(0, 3):
-                                self.scalefac_s[gran][chan][k][sfb] = self._bits.read_as_int(slen1)
-                        for k in range(6, 12):
-                            self.scalefac_s[gran][chan][k] = [0] * 3
-                            for sfb in range(0, 3):
-                                self.scalefac_s[gran][chan][k][sfb] = self._bits.read_as_int(slen2)
+                part2_start = self._bits.get_pointer()
+                short = channel.windows_switching_flag and channel.block_type == BlockTypeInfo.THREE_SHORT_WINDOWS
+                # granule 1 may reuse the long block scale factors of granule 0.
+                scfsi = tuple(self.side_info.scfsi[chan]) if gran == 1 and not short else None
+                plan = scale_factor_plan(channel.scalefac_compress, short, channel.mixed_block_flag and short, scfsi)
+                scalefac_l = self.scalefac_l[gran][chan]
+                scalefac_s = self.scalefac_s[gran][chan]
+                # the buffers still hold the previous frame's factors.
+                scalefac_l[:] = _ZERO_LONG
+                for band in scalefac_s:
+                    band[:] = _ZERO_WINDOWS
+                for kind, first, count, slen in plan:
+                    if kind == 'reuse':
+                        scalefac_l[first:first + count] = self.scalefac_l[0][chan][first:first + count]
+                        continue
+                    values = count * 3 if kind == 's' else count
+                    bits = self._bits.read_as_int(values * slen)
+                    mask = (1 << slen) - 1
+                    shift = (values - 1) * slen
+                    if kind == 'l':
+                        for sfb in range(first, first + count):
+                            scalefac_l[sfb] = (bits >> shift) & mask
+                            shift -= slen
                     else:
-                        # just short blocks 18 slen1 + 18 slen2 factors
-                        # TODO: check why origin just read 9 factors
-                        # for k in range(3, 6):
-                        for k in range(0, 6):
-                            self.scalefac_s[gran][chan][k] = [0] * 3
-                            for sfb in range(0, 3):
-                                self.scalefac_s[gran][chan][k][sfb] = self._bits.read_as_int(slen1)
-                        for k in range(6, 12):
-                            self.scalefac_s[gran][chan][k] = [0] * 3
-                            for sfb in range(0, 3):
-                                self.scalefac_s[gran][chan][k][sfb] = self._bits.read_as_int(slen2)
-                else:
-                    # scale factors for long blocks
-                    # 11 slen1 + 10 slen2 factors
-                    if gran == 0:
-                        for sfb in range(0, 11):
-                            self.scalefac_l[gran][chan][sfb] = self._bits.read_as_int(slen1)
-                        for sfb in range(11, 21):
-                            self.scalefac_l[gran][chan][sfb] = self._bits.read_as_int(slen2)
-                    else:
-                        # reuse the scale factors from the first granule base on scifi.
-                        indices = [(0, 6), (6, 11), (11, 16), (16, 21)]
-                        for k in range(0, 2):
-                            start, end = indices[k]
-                            for sfb in range(start, end):
-                                if self.side_info.scfsi[chan][k] == 1:  # reuse granule 0
-                                    self.scalefac_l[gran][chan][sfb] = self.scalefac_l[gran - 1][chan][sfb]
-                                else:
-                                    self.scalefac_l[gran][chan][sfb] = self._bits.read_as_int(slen1)
-                        for k in range(2, 4):
-                            start, end = indices[k]
-                            for sfb in range(start, end):
-                                if self.side_info.scfsi[chan][k] == 1:  # reuse granule 0
-                                    self.scalefac_l[gran][chan][sfb] = self.scalefac_l[gran - 1][chan][sfb]
-                                else:
-                                    self.scalefac_l[gran][chan][sfb] = self._bits.read_as_int(slen2)
-                    self.scalefac_l[gran][chan][21] = 0
+                        for sfb in range(first, first + count):
+                            for window in range(3):
+                                scalefac_s[sfb][window] = (bits >> shift) & mask
+                                shift -= slen
+                part3_end = part2_start + channel.part2_3_length
+                self.part3_bounds[gran][chan] = (self._bits.get_pointer(), part3_end)
+                # skip the Huffman codes, the next channel's scale factors follow them.
+                self._bits.set_pointer(min(part3_end, self._bits.get_length()))
 
     def unpack_huffman(self):
         """
@@ -148,81 +189,68 @@ class MainData:
         - count1/quadruple
         - zero
 
-        we're assuming here that self.bits() has been put at the right location
-        for us to just start reading
+        Every big values region is one run of lines decoded with a single table, see big_value_runs.
+        The count1 region lasts until the part 3 bits of the channel end, the rest is the zero region.
+        Lines above the subbands to synthesize aren't decoded: the channel's codes stop there, and the
+        next channel starts at its own part 3 bounds.
         """
-
-        samples_per_granule = 576
+        symbols = 0
+        line_limit = 18 * self.subbands
         self.frequency_lines = [0] * 2
+        self.nonzero_bound = [0] * 2
         for gran in range(0, 2):
             self.frequency_lines[gran] = [0] * 2
+            self.nonzero_bound[gran] = [0] * 2
             granule = self.side_info.granules[gran]
             for chan in range(0, self.channel_num):
                 channel = granule.channels[chan]
-                self.frequency_lines[gran][chan] = [0] * 576
-                # print(chan, granule)
-                if channel.windows_switching_flag and channel.block_type == BlockTypeInfo.THREE_SHORT_WINDOW:
-                    # mixed & short blocks
-                    region_1_start = 36
-                    region_2_start = samples_per_granule
-                else:
-                    sampling_freq = self.header.sampling_rate_frequency
-                    long_bands = self.scale_band_indicies[sampling_freq]['L']
-                    # print('gran chan region0: {}'.format(granule['region0_count']))
-                    # print('windows_switching_flag: {}'.format(granule['windows_switching_flag']))
-                    region_1_start = long_bands[channel.region0_count + 1]
-
-                    region_2_idx = (channel.region0_count +
-                                    channel.region1_count + 2)
-                    # print('region_2_idx: {}'.format(region_2_idx))
-                    region_2_start = long_bands[region_2_idx]
+                part3_start, part3_end = self.part3_bounds[gran][chan]
+                self._bits.set_pointer(min(part3_start, self._bits.get_length()))
+                if huffman_logger.isEnabledFor(logging.DEBUG):
+                    huffman_logger.debug("- granule %d channel %d huffman bits: %d-%d", gran, chan,
+                                         part3_start, part3_end)
+                lines = self._lines('lines%d%d' % (gran, chan), 576)
+                self.frequency_lines[gran][chan] = lines
 
                 # big value regions
-                early_stop = False
-                for i in range(0, channel.big_values * 2, 2):
-                    if self._bits.peek(1) == b'':
-                        break
-                    elif i >= len(self.frequency_lines[gran][chan]):
-                        # If there are more Huffman code bits than necessary to decode 576 values
-                        # they are regarded as stuffing bits and discarded.
-                        early_stop = True
-                        break
-                    table_num = 0
-                    if i < region_1_start:
-                        table_num = channel.table_select[0]
-                    elif i < region_2_start:
-                        table_num = channel.table_select[1]
-                    else:
-                        table_num = channel.table_select[2]
-                    if table_num == 0:
-                        self.frequency_lines[gran][chan][i] = 0.0
-                    x, y = decode_big_values(self._bits, table_num)
-                    self.frequency_lines[gran][chan][i] = float(x)
-                    self.frequency_lines[gran][chan][i + 1] = float(y)
-                if early_stop:
-                    break
-
-                # quad region
-                table_num = int(channel.count1table_select)
-                # iterate until we're either out of bits or we have 576 samples
-                position = channel.big_values * 2
-                for i in range(channel.big_values * 2, 576, 4):
-                    position = i
-                    # If we're out of bits, break out!
-                    if self._bits.peek(1) == b'' or i >= len(self.frequency_lines[gran][chan]) - 4:
-                        break
-                    v, w, x, y = decode_quadruples(self._bits, table_num)
-                    self.frequency_lines[gran][chan][i] = float(v)
-                    self.frequency_lines[gran][chan][i + 1] = float(w)
-                    self.frequency_lines[gran][chan][i + 2] = float(x)
-                    self.frequency_lines[gran][chan][i + 3] = float(y)
-                position += 1
-                while position < 576:
-                    # remaining zero regions.
-                    self.frequency_lines[gran][chan][i] = 0
-                    position += 1
-
+                for start, end, table_num in self.big_value_runs(channel, line_limit):
+                    decode_big_values_run(self._bits, table_num, lines, start, end)
+                big_values_end = min(channel.big_values * 2, 576)
+                symbols += min(big_values_end, line_limit) // 2
+
+                # quad region, table 32 or 33
+                count1_end = min(big_values_end, line_limit)
+                if big_values_end < line_limit:
+                    count1_end = decode_count1_run(self._bits, 32 + channel.count1table_select, lines,
+                                                   big_values_end, part3_end, line_limit)
+                    symbols += (count1_end - big_values_end) // 4
+                # remaining lines are the zero region, or aren't synthesized.
+                self._bits.set_pointer(min(part3_end, self._bits.get_length()))
+
+                # everything above the last non-zero line is zero, later stages only need to work below it.
+                self.nonzero_bound[gran][chan] = min(nonzero_bound(lines[:count1_end]), line_limit)
                 # finally, unpack huffman come to the end.
+        self.huffman_symbols = symbols
+        self.bits_consumed = max(end for bounds in self.part3_bounds for _, end in bounds)
+
+    def big_value_runs(self, channel, line_limit=576) -> list:
+        '''
+        the big values lines of a channel split at the region boundaries, as (start, end, table) runs.
+        Lines above big_values * 2 aren't coded, neither are lines above 576: they are stuffing.
+        line_limit: runs stop there, the lines above it aren't decoded.
+        '''
+        if channel.windows_switching_flag and channel.block_type == BlockTypeInfo.THREE_SHORT_WINDOWS:
+            # mixed & short blocks
+            region_1_start = 36
+            region_2_start = 576
+        else:
+            long_bands = self.scale_band_indicies[self.header.sampling_rate_frequency]['L']
+            region_1_start = long_bands[channel.region0_count + 1]
+            region_2_start = long_bands[min(channel.region0_count + channel.region1_count + 2, 22)]
+        big_values_end = min(channel.big_values * 2, 576, line_limit)
+        bounds = [0, min(region_1_start, big_values_end), min(region_2_start, big_values_end), big_values_end]
+        return [(bounds[region], bounds[region + 1], channel.table_select[region])
+                for region in range(3) if bounds[region] < bounds[region + 1]]
 
     def requantization(self):
         '''
@@ -234,10 +262,11 @@ class MainData:
         '''
         self.xr = [0] * 2
         for gran in range(2):
-            self.xr[gran] = [0] * 2
+            self.xr[gran] = [0] * self.channel_num
             for chan in range(self.channel_num):
-                self.xr[gran][chan] = [0] * 576
+                xr = self.xr[gran][chan] = self._lines('xr%d%d' % (gran, chan), 576)
                 channel = self.side_info.granules[gran].channels[chan]
+                bound = self.nonzero_bound[gran][chan]
                 scalefac_multiplier = (channel.scalefac_scale + 1) / 2
                 if channel.windows_switching_flag and channel.block_type == BlockTypeInfo.THREE_SHORT_WINDOWS:
                     # short block
@@ -247,7 +276,10 @@ class MainData:
                         for window in range(3):
                             for j in range(sfb_indicies[sfb + 1] - sfb_indicies[sfb]):
                                 i = loop_idx + j
-                                self.xr[gran][chan][i] = requantize_s(self.frequency_lines[gran][chan][i],
+                                if i >= bound:
+                                    # zero frequency line stays zero.
+                                    continue
+                                xr[i] = requantize_s(self.frequency_lines[gran][chan][i],
                                                                       channel.global_gain,
                                                                       channel.subblock_gain[window],
                                                                       scalefac_multiplier,
@@ -258,8 +290,8 @@ class MainData:
                     # long blocks
                     sfb_indicies = self.scale_band_indicies[self.header.sampling_rate_frequency]['L']
                     for sfb in range(len(sfb_indicies) - 1):
-                        for i in range(sfb_indicies[sfb], sfb_indicies[sfb + 1]):
-                            self.xr[gran][chan][i] = requantize_l(self.frequency_lines[gran][chan][i],
+                        for i in range(sfb_indicies[sfb], min(sfb_indicies[sfb + 1], bound)):
+                            xr[i] = requantize_l(self.frequency_lines[gran][chan][i],
                                                                   channel.global_gain,
                                                                   scalefac_multiplier,
                                                                   self.scalefac_l[gran][chan][sfb],
@@ -286,16 +318,16 @@ class MainData:
         the stereo signal can be read from the mode and mode_extension in the header of each frame.
         '''
         if self.header.channel_mode == ChannelModeInfo.JOINT_STEREO:
-            print('-> frame used Joint stereo mode.')
+            synthesis_logger.debug('-> frame used Joint stereo mode.')
             # TODO: assuming PC use big order.
             is_intensity_stereo = True if self.header.mode_extension[1] == '1' else False
             is_MS_stereo = True if self.header.mode_extension[0] == '1' else False
             if is_MS_stereo:
-                print('-> MS stereo decoding.')
+                synthesis_logger.debug('-> MS stereo decoding.')
                 self._MS_stereo_decode()
             # TODO: check self.L R
             if is_intensity_stereo:
-                print('-> Intensity stereo decoding.')
+                synthesis_logger.debug('-> Intensity stereo decoding.')
                 self._intensity_stereo_decode()
         else:
             # TODO: save result in xr.
@@ -307,30 +339,52 @@ class MainData:
     def _intensity_stereo_decode(self):
         pass
 
+    def downmix_to_mono(self):
+        '''
+        Average the two channels in the frequency domain. IMDCT and synthesis are linear, so only the
+        averaged channel needs to be transformed.
+
+        Channels of a granule with different block types are windowed differently and can't be mixed
+        here, they go through IMDCT separately and are averaged in time domain afterwards.
+        '''
+        if self.channel_num == 1:
+            return
+        for gran in range(2):
+            left, right = self.side_info.granules[gran].channels
+            if _window_shape(left) != _window_shape(right):
+                continue
+            self.xr[gran] = [self._average(*self.xr[gran])]
+            self.nonzero_bound[gran] = [max(self.nonzero_bound[gran])]
+        # from now on we produce a single channel.
+        self.channel_num = 1
+
     def aliasing_reduction(self):
         '''
         Aliasing reduction is done by merging the frequency lines
-        using eight butterfly calculations for each sub-band.
+        using eight butterfly calculations at every boundary between two sub-bands.
 
+        Short blocks have no butterflies, mixed blocks only between the two long subbands.
         result save back in xr.
         '''
-        # butterfly_coefficients
-        c = [-0.6, -0.535, -0.33, -0.185, -0.095, -0.041, -0.00142, -0.0037]
-        cs = [1 / ((1 + c_i ** 2) ** 0.5) for c_i in c]
-        ca = [c_i / ((1 + c_i ** 2) ** 0.5) for c_i in c]
-
         for gran in range(2):
-            for chan in range(self.channel_num):
-                xar = [0] * 576
-                # eight butterfly calculations for each subband
-                for sb in range(32):
+            for chan in range(len(self.xr[gran])):
+                sblimit = alias_sblimit(self.side_info.granules[gran].channels[chan])
+                # butterflies between two all-zero subbands give zero again.
+                boundaries = min(sblimit, self._nonzero_subbands(gran, chan) + 1)
+                xr = self.xr[gran][chan]
+                for sb in range(1, boundaries):
                     for i in range(8):
-                        xar[18 * sb + 18 - i - 1] = self.xr[gran][chan][18 * sb + 18 - i - 1] * cs[i] - \
-                                                    self.xr[gran][chan][18 * sb + i] * ca[i]
-                        xar[18 * sb + i] = self.xr[gran][chan][18 * sb + i] + \
-                                           self.xr[gran][chan][18 * sb + 18 - i - 1] * ca[i]
-                    # save aliasing reduction back.
-                    self.xr[gran][chan] = xar
+                        lo, hi = xr[18 * sb - 1 - i], xr[18 * sb + i]
+                        xr[18 * sb - 1 - i] = lo * ALIAS_CS[i] - hi * ALIAS_CA[i]
+                        xr[18 * sb + i] = hi * ALIAS_CS[i] + lo * ALIAS_CA[i]
+                self._alias_bound(gran, chan, boundaries)
+
+    def _alias_bound(self, gran, chan, boundaries):
+        # the butterflies of the last boundary spread the highest non-zero subband into the next one.
+        nonzero_subbands = self._nonzero_subbands(gran, chan)
+        if 0 < nonzero_subbands < boundaries:
+            bound = max(self.nonzero_bound[gran][chan], 18 * nonzero_subbands + 8)
+            self.nonzero_bound[gran][chan] = min(bound, 18 * self.subbands)
 
     def IMDCT(self):
         '''
@@ -338,21 +392,35 @@ class MainData:
         subbands. The IMDC will output 18 time domain samples for each of the 32 subbands.
 
         The first half of the block of 36 values is overlapped with the second half of the
-        previous block. The second half of the actual block is stored to be used in
-        the next block.
+        previous block of the same subband. The second half of the actual block is stored in
+        self.state to be used in the next block, which may be in the next frame.
         '''
-        z, pre_z = None, [0] * 18
+        z = None
         self.samples = [0] * 2
+        self.active_subbands = [0] * 2
         for gran in range(2):
-            self.samples[gran] = [0] * self.channel_num
-            for chan in range(self.channel_num):
-                self.samples[gran][chan] = [0] * 32
+            channels = len(self.xr[gran])
+            if channels > self.channel_num:
+                # channels left apart by the mono downmix both continue the mixed overlap, see _downmix_samples.
+                self.state.overlap[1] = [list(tail) for tail in self.state.overlap[0]]
+                self.state.active[1] = self.state.active[0]
+            self.samples[gran] = [0] * channels
+            self.active_subbands[gran] = [0] * channels
+            for chan in range(channels):
+                overlap = self.state.overlap[chan]
+                samples = self.samples[gran][chan] = self._rows('samples%d%d' % (gran, chan), 32, 18)
                 block_type = self.side_info.granules[gran].channels[chan].block_type
                 n = 12 if block_type == BlockTypeInfo.THREE_SHORT_WINDOWS else 36
                 pai_factor = math.pi / (2 * n)
+                nonzero_subbands = self._nonzero_subbands(gran, chan)
+                # subbands past the non-zero ones still output the overlap tail of their previous block.
+                active_subbands = max(nonzero_subbands, self.state.active[chan])
                 # generate time-domain samples
-                for sb in range(32):
-                    if block_type == BlockTypeInfo.THREE_SHORT_WINDOWS:
+                for sb in range(active_subbands):
+                    if sb >= nonzero_subbands:
+                        # all-zero subband: IMDCT output is zero, only the overlap tail of the previous block remains.
+                        z = [0] * 36
+                    elif block_type == BlockTypeInfo.THREE_SHORT_WINDOWS:
                         # short blocks
                         x = [[0] * n for _ in range(3)]  # store time-samples
                         for window in range(3):
@@ -374,8 +442,66 @@ class MainData:
                             z = self._window_overlaping_long_block(x)
                         else:
                             raise Exception
-                    self.samples[gran][chan][sb] = [z[i] + pre_z[i] for i in range(18)]
-                    pre_z = z[18:]
+                    tail = overlap[sb]
+                    samples[sb][:] = [z[i] + tail[i] for i in range(18)]
+                    tail[:] = z[18:]
+                self.state.active[chan] = nonzero_subbands
+                self.active_subbands[gran][chan] = active_subbands
+            if channels > self.channel_num:
+                # channels left apart by the mono downmix, average them in time domain.
+                self._downmix_samples(gran)
+                self.nonzero_bound[gran] = [max(self.nonzero_bound[gran])]
+
+    def _downmix_samples(self, gran):
+        '''
+        average both channels of a granule, and their overlap tails: IMDCT is linear, so the mixed
+        tail is what the next granule overlaps with, whether its channels are mixed before IMDCT or not.
+        '''
+        left, right = self.samples[gran]
+        self.samples[gran] = [[self._average(left[sb], right[sb]) for sb in range(32)]]
+        self.active_subbands[gran] = [max(self.active_subbands[gran])]
+        self.state.overlap[0] = [self._average(l, r) for l, r in zip(*self.state.overlap)]
+        self.state.active[0] = max(self.state.active)
+
+    def _average(self, left: list, right: list) -> list:
+        return [(l + r) / 2 for l, r in zip(left, right)]
+
+    def zero_subbands(self) -> int:
+        '''
+        number of subbands of all channels which IMDCT skipped as all-zero. The subbands above
+        self.subbands, dropped when down sampling, are never decoded and not counted.
+        '''
+        return sum(self.subbands - self._nonzero_subbands(gran, chan)
+                   for gran in range(2) for chan in range(len(self.nonzero_bound[gran])))
+
+    def _nonzero_subbands(self, gran, chan) -> int:
+        '''
+        number of leading subbands which contain at least one non-zero frequency line.
+        '''
+        return (self.nonzero_bound[gran][chan] + 17) // 18
+
+    def _lines(self, name: str, size: int) -> list:
+        '''
+        a list of size zeros kept in self.buffers, the same list zeroed again when the next frame asks for it.
+        '''
+        lines = self.buffers.get(name)
+        if lines is None or len(lines) != size:
+            lines = self.buffers[name] = [0.0] * size
+        else:
+            lines[:] = _zeros(size)
+        return lines
+
+    def _rows(self, name: str, rows: int, size: int) -> list:
+        '''
+        rows lists of size zeros kept in self.buffers, like _lines.
+        '''
+        block = self.buffers.get(name)
+        if block is None or len(block) != rows or len(block[0]) != size:
+            block = self.buffers[name] = [[0.0] * size for _ in range(rows)]
+        else:
+            for row in block:
+                row[:] = _zeros(size)
+        return block
 
     def _generate_IMDCT_sample(self, i, n, pai_factor, gran, chan, sb, window=None) -> float:
         '''
@@ -459,49 +585,180 @@ class MainData:
         '''
         for gran in range(2):
             for chan in range(self.channel_num):
-                for sb in range(0, 32, 2):
-                    # TODO: what is odd? zero base or one base
-                    for idx in range(0, 18, 2):
+                # zero based: subbands 1, 3, ... 31 and samples 1, 3, ... 17
+                for sb in range(1, 32, 2):
+                    for idx in range(1, 18, 2):
                         self.samples[gran][chan][sb][idx] *= -1
 
     def synthesis(self):
         '''
         The synthesis Polyphase filterbank transforms the 32 subbands of 18 time domain samples in
         each granule to 18 blocks of 32 PCM samples, which is the final decoding result.
+        Every block shifts a new V vector into a FIFO of the last 16, kept in self.state across frames.
+
+        When down sampling, only the lower self.subbands subbands are synthesized with a
+        correspondingly decimated window, giving self.subbands PCM samples per block.
         '''
-        print('-> synthesis Polyphase filterbank transforming.')
-        queue_V = []
-        self.pcm_output = []
+        if synthesis_logger.isEnabledFor(logging.DEBUG):
+            synthesis_logger.debug('-> synthesis Polyphase filterbank transforming %d subbands.', self.subbands)
+        subbands = self.subbands
+        window = sythesis_coefficients.D[::32 // subbands]
+        pcm_output = self.pcm_output = self._lines('pcm', 2 * self.channel_num * 18 * subbands)
+        position = 0
         for gran in range(2):
             for chan in range(self.channel_num):
-                for idx in range(16):
-                    # TODO: quite confused. We have 18 subbands but just use 16
+                queue_V = self.state.fifo[chan]
+                active_subbands = min(subbands, self.active_subbands[gran][chan])
+                for idx in range(18):
                     # 1. fetch subband samples
-                    X = [self.samples[gran][chan][sb][idx] for sb in range(32)]
-                    # 2. DCT without optimization
-                    queue_V.append(self._DCT_I(X))
-                # 3. create U vector.
-                U, flap = [], 0
-                for idx in range(16):
-                    U += queue_V[idx][flap * 32:(flap + 1) * 32]
-                    flap = 1 - flap
-
-                # 4. produce W vector
-                W = [U[i] * sythesis_coefficients.D[i] for i in range(512)]
-
-                # 5. produce PCM samples
-                self.pcm_output += [sum([W[j + 32 * i] for i in range(16)]) for j in range(32)]
-
-    def _DCT_I(self, X: list) -> list:
+                    X = [self.samples[gran][chan][sb][idx] for sb in range(subbands)]
+                    # 2. DCT without optimization, the newest V vector goes first.
+                    queue_V.insert(0, self._DCT_I(X, active_subbands, subbands))
+                    queue_V.pop()
+                    # 3. create U vector: the first half of even V vectors, the second half of odd ones.
+                    U = []
+                    for i in range(16):
+                        U += queue_V[i][(i % 2) * subbands:(i % 2 + 1) * subbands]
+
+                    # 4. produce W vector
+                    W = [U[i] * window[i] for i in range(16 * subbands)]
+
+                    # 5. produce PCM samples
+                    pcm_output[position:position + subbands] = [sum([W[j + subbands * i] for i in range(16)])
+                                                                for j in range(subbands)]
+                    position += subbands
+
+    def _DCT_I(self, X: list, active_subbands=32, subbands=32) -> list:
         '''
         DCT-I (32-64)
         $V[i]=\sum_{k=0}^{31} X[k] \cos \left[\frac{(16+i)(2 k+1) \pi}{64}\right]$ for $i=0,1, \ldots 63$
+
+        X[k] for k >= active_subbands are known to be zero and skipped.
+        With N subbands the same transform is (N-2N): cos[(N/2+i)(2k+1)pi/2N] for i=0,1,...2N-1
         '''
         # V=[0]*64
-        V = [sum([X[k] * math.cos((16 + i) * (2 * k + 1) * math.pi / 64) for k in range(32)]) for i in range(64)]
+        V = [sum([X[k] * math.cos((subbands // 2 + i) * (2 * k + 1) * math.pi / (2 * subbands))
+                  for k in range(active_subbands)])
+             for i in range(2 * subbands)]
         return V
 
 
+class DecoderState:
+    '''
+    what the transform stages of a frame leave to the next frame of the stream, per channel:
+    overlap: second half of the last IMDCT block of every subband, 32 lists of 18 samples
+    active: number of leading subbands whose overlap may be non-zero
+    fifo: the last 16 V vectors of the synthesis filterbank, newest first
+    '''
+
+    def __init__(self, subbands=32):
+        self.subbands = subbands
+        self.reset()
+
+    def reset(self):
+        '''
+        zero the overlap and FIFO in place, they are allocated by the first call.
+        '''
+        if not hasattr(self, 'overlap'):
+            self.overlap = [[[0.0] * 18 for _ in range(32)] for _ in range(2)]
+            self.fifo = [[[0.0] * (2 * self.subbands) for _ in range(16)] for _ in range(2)]
+        else:
+            zero_fill(self.overlap)
+            zero_fill(self.fifo)
+        self.active = [0, 0]
+
+
+def zero_fill(buffer):
+    '''
+    set every element of an array, or of nested lists of numbers, to zero in place.
+    '''
+    if not isinstance(buffer, list):
+        buffer[...] = 0
+    elif buffer and isinstance(buffer[0], (int, float)):
+        buffer[:] = _zeros(len(buffer))
+    else:
+        for item in buffer:
+            zero_fill(item)
+
+
+@lru_cache(maxsize=None)
+def _zeros(size: int) -> tuple:
+    return (0.0,) * size
+
+
+# butterfly coefficients of aliasing reduction
+ALIAS_C = [-0.6, -0.535, -0.33, -0.185, -0.095, -0.041, -0.0142, -0.0037]
+ALIAS_CS = [1 / ((1 + c_i ** 2) ** 0.5) for c_i in ALIAS_C]
+ALIAS_CA = [c_i / ((1 + c_i ** 2) ** 0.5) for c_i in ALIAS_C]
+
+
+def alias_sblimit(channel) -> int:
+    '''
+    aliasing reduction runs on the boundaries of subbands 1 .. sblimit-1 of a channel.
+    '''
+    if channel.windows_switching_flag and channel.block_type == BlockTypeInfo.THREE_SHORT_WINDOWS:
+        return 2 if channel.mixed_block_flag else 0
+    return 32
+
+
+_ZERO_LONG = (0,) * 22
+_ZERO_WINDOWS = (0,) * 3
+_NO_PART3 = ((0, 0),) * 2
+
+
+@lru_cache(maxsize=None)
+def scale_factor_plan(scalefac_compress: int, short: bool, mixed: bool, scfsi: tuple = None) -> tuple:
+    '''
+    how the scale factors of a channel are laid out in the main data, as runs of
+    (kind, first band, number of bands, bits per factor). kind is
+    - 'l': long bands, one factor each
+    - 's': short bands, one factor for each of the 3 windows
+    - 'reuse': long bands copied from granule 0, nothing is read
+    scfsi: the scale factor selection info of the channel in granule 1 long blocks, None otherwise.
+    '''
+    slen1, slen2 = MainData.scalefac_sizes[scalefac_compress]
+    if short and mixed:
+        # mixed blocks & short blocks 17 slen1 + 18 slen2 factors
+        runs = [('l', 0, 8, slen1), ('s', 3, 3, slen1), ('s', 6, 6, slen2)]
+    elif short:
+        # just short blocks 18 slen1 + 18 slen2 factors
+        runs = [('s', 0, 6, slen1), ('s', 6, 6, slen2)]
+    elif scfsi is None:
+        # long blocks 11 slen1 + 10 slen2 factors
+        runs = [('l', 0, 11, slen1), ('l', 11, 10, slen2)]
+    else:
+        # bands of the 4 scfsi groups, the first two use slen1.
+        runs = []
+        for k, (first, end) in enumerate([(0, 6), (6, 11), (11, 16), (16, 21)]):
+            run = ('reuse' if scfsi[k] == 1 else 'l', first, end - first, slen1 if k < 2 else slen2)
+            previous = runs[-1] if runs else None
+            if previous and previous[0] == run[0] and previous[3] == run[3]:
+                # consecutive groups read with the same width are a single read.
+                runs[-1] = (run[0], previous[1], previous[2] + run[2], run[3])
+            else:
+                runs.append(run)
+    return tuple(runs)
+
+
+def _window_shape(channel) -> tuple:
+    '''
+    fields of channel side info which decide how IMDCT windows the channel.
+    '''
+    if not channel.windows_switching_flag:
+        return channel.block_type, False
+    return channel.block_type, channel.mixed_block_flag
+
+
+def nonzero_bound(frequency_lines: list) -> int:
+    '''
+    index just after the last non-zero frequency line, 0 if all lines are zero.
+    '''
+    bound = len(frequency_lines)
+    while bound > 0 and frequency_lines[bound - 1] == 0:
+        bound -= 1
+    return bound
+
+
 def requantize_s(fre_line, global_gain, subblock_gain, multiplier, scalefac_s):
     '''
     requantization for short block.
@@ -512,7 +769,7 @@ def requantize_s(fre_line, global_gain, subblock_gain, multiplier, scalefac_s):
         # too small, no need to compute.
         return 0
     else:
-        xr = (fre_line ** (4 / 3)) * (2 ** (a + b))
+        xr = (abs(fre_line) ** (4 / 3)) * (2 ** (a + b))
         return xr if fre_line > 0 else -xr
 
 
@@ -526,5 +783,5 @@ def requantize_l(fre_line, global_gain, multiplier, scalefac_l, preflag, pretab)
         # too small, no need to compute.
         return 0
     else:
-        xr = (fre_line ** (4 / 3)) * (2 ** (c + d))
+        xr = (abs(fre_line) ** (4 / 3)) * (2 ** (c + d))
         return xr if fre_line > 0 else -xr
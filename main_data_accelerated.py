@@ -0,0 +1,186 @@
+from functools import lru_cache
+
+import numpy as np
+
+from header import Header
+from huffman import HUFFMAN_TABLE, HUFFMAN_TABLE_INFO
+from main_data_numpy import NumpyMainData
+from side_info import SideInfo
+from utils.bit import Bit
+
+try:
+    import numba
+except ImportError:  # the accelerated engine is optional
+    numba = None
+
+# True when Huffman decoding runs as compiled code, otherwise AcceleratedMainData is NumpyMainData.
+ACCELERATED = numba is not None
+
+# status codes of _decode_channel
+_OK, _OUT_OF_BITS = 0, 1
+
+
+class AcceleratedMainData(NumpyMainData):
+    """
+    NumpyMainData whose Huffman decoding is compiled with numba, when numba is importable.
+    The compiled decoder walks the same Huffman trees in the same order as MainData.unpack_huffman.
+    """
+
+    def decode(self, header: Header, side_info: SideInfo, bytes_str: str, transform=True):
+        self._bit_string = bytes_str
+        super().decode(header, side_info, bytes_str, transform)
+
+    if ACCELERATED:
+        def unpack_huffman(self):
+            '''
+            MainData.unpack_huffman with the regions of a channel decoded by one compiled call.
+            '''
+            tables, table_info = huffman_arrays()
+            bits = np.frombuffer(self._bit_string.encode('ascii'), dtype=np.uint8) - ord('0')
+            symbols = 0
+            line_limit = 18 * self.subbands
+            self.frequency_lines = [0] * 2
+            self.nonzero_bound = [0] * 2
+            for gran in range(2):
+                self.frequency_lines[gran] = [0] * 2
+                self.nonzero_bound[gran] = [0] * 2
+                for chan in range(self.channel_num):
+                    channel = self.side_info.granules[gran].channels[chan]
+                    part3_start, part3_end = self.part3_bounds[gran][chan]
+                    runs = np.array(self.big_value_runs(channel, line_limit), dtype=np.int32).reshape(-1, 3)
+                    lines = self._block('lines%d%d' % (gran, chan), (576,), np.float64)
+                    lines[:] = 0
+                    self.frequency_lines[gran][chan] = lines
+                    big_values_end = min(channel.big_values * 2, 576)
+                    status, count1_end = _decode_channel(bits, part3_start, part3_end, lines, runs, big_values_end,
+                                                         line_limit, 32 + channel.count1table_select, tables,
+                                                         table_info)
+                    if status == _OUT_OF_BITS:
+                        raise IndexError("invalid number of bits to read.")
+                    symbols += min(big_values_end, line_limit) // 2 + max(count1_end - big_values_end, 0) // 4
+                    nonzero = np.flatnonzero(lines[:count1_end])
+                    bound = nonzero[-1] + 1 if len(nonzero) else 0
+                    self.nonzero_bound[gran][chan] = min(int(bound), line_limit)
+            self.bits_consumed = max(end for bounds in self.part3_bounds for _, end in bounds)
+            self._bits = Bit(self._bit_string, min(self.bits_consumed, len(self._bit_string)))
+            self.huffman_symbols = symbols
+
+
+@lru_cache(maxsize=None)
+def huffman_arrays() -> tuple:
+    '''
+    HUFFMAN_TABLE as an array, and (offset, tree length, linbits) of every table in it.
+    '''
+    tables = np.array(HUFFMAN_TABLE, dtype=np.int32)
+    table_info = np.zeros((len(HUFFMAN_TABLE_INFO), 3), dtype=np.int32)
+    for num, (table, tree_length, linbits) in enumerate(HUFFMAN_TABLE_INFO):
+        if tree_length == 0:
+            continue
+        offset = next(i for i in range(len(HUFFMAN_TABLE) - len(table) + 1)
+                      if HUFFMAN_TABLE[i:i + len(table)] == table)
+        table_info[num] = offset, tree_length, linbits
+    return tables, table_info
+
+
+def _traverse_table(bits, pointer, tables, offset):
+    '''
+    huffman.traverse_table over the bit array, returns x, y and the new pointer. Pointer -1: out of bits.
+    '''
+    point = offset
+    for _ in range(32):
+        if (tables[point] & 0xff00) == 0:
+            return (tables[point] >> 4) & 0xf, tables[point] & 0xf, pointer
+        if pointer >= len(bits):
+            return 0, 0, -1
+        bit = bits[pointer]
+        pointer += 1
+        if bit == 1:
+            while (tables[point] & 0xff) >= 250:
+                point += tables[point] & 0xff
+            point += tables[point] & 0xff
+        else:
+            while (tables[point] >> 8) >= 250:
+                point += tables[point] >> 8
+            point += tables[point] >> 8
+    return 0, 0, pointer
+
+
+def _read_int(bits, pointer, num):
+    value = 0
+    for i in range(num):
+        value = (value << 1) | bits[pointer + i]
+    return value
+
+
+def _decode_channel(bits, pointer, part3_end, lines, runs, count1_start, line_limit, count1_table, tables,
+                    table_info):
+    '''
+    big value runs and count1 region of one channel up to line_limit, see MainData.unpack_huffman.
+    returns status and the index after the last count1 line.
+    '''
+    length = len(bits)
+    for run in range(len(runs)):
+        start, end, table_num = runs[run]
+        offset, tree_length, linbits = table_info[table_num]
+        if tree_length == 0:
+            continue
+        for i in range(start, end, 2):
+            x, y, pointer = _traverse_table(bits, pointer, tables, offset)
+            if pointer < 0:
+                return _OUT_OF_BITS, 0
+            if linbits != 0 and x == 15:
+                if pointer + linbits > length:
+                    return _OUT_OF_BITS, 0
+                x += _read_int(bits, pointer, linbits)
+                pointer += linbits
+            if x != 0:
+                if pointer >= length:
+                    return _OUT_OF_BITS, 0
+                if bits[pointer] == 1:
+                    x = -x
+                pointer += 1
+            if linbits != 0 and y == 15:
+                if pointer + linbits > length:
+                    return _OUT_OF_BITS, 0
+                y += _read_int(bits, pointer, linbits)
+                pointer += linbits
+            if y != 0:
+                if pointer >= length:
+                    return _OUT_OF_BITS, 0
+                if bits[pointer] == 1:
+                    y = -y
+                pointer += 1
+            lines[i] = x
+            lines[i + 1] = y
+
+    # count1 region, until the channel's bits end. A quadruple reaching past them is discarded.
+    i = count1_start
+    end_bit = min(part3_end, length)
+    offset = table_info[count1_table, 0]
+    quad = np.zeros(4)
+    while i < line_limit and i + 4 <= 576 and pointer < end_bit:
+        _, y, pointer = _traverse_table(bits, pointer, tables, offset)
+        if pointer < 0:
+            break
+        for k in range(4):
+            value = (y >> (3 - k)) & 1
+            if value != 0:
+                if pointer >= length:
+                    pointer = -1
+                    break
+                if bits[pointer] == 1:
+                    value = -value
+                pointer += 1
+            quad[k] = value
+        if pointer < 0 or pointer > end_bit:
+            break
+        lines[i:i + 4] = quad
+        i += 4
+    return _OK, i
+
+
+if ACCELERATED:
+    _traverse_table = numba.njit(cache=True)(_traverse_table)
+    _read_int = numba.njit(cache=True)(_read_int)
+    # without the GIL, so that a pipelined MP3File transforms other frames meanwhile.
+    _decode_channel = numba.njit(cache=True, nogil=True)(_decode_channel)
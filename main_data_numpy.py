@@ -0,0 +1,276 @@
+import numpy as np
+
+from header import Header
+from main_data import MainData, alias_sblimit
+from side_info import SideInfo, BlockTypeInfo
+from utils.stats import DecodeStats
+from utils.tables import ALIAS_HI, ALIAS_LO, alias_tables, imdct_tables, pow43, synthesis_tables
+
+
+class NumpyMainData(MainData):
+    """
+    MainData which runs requantization and the transform stages as NumPy array
+    operations in a selectable dtype. np.float32 halves the memory traffic of every buffer and table
+    compared to the float64 Python reference.
+
+    The stages compute the same formulas in the same order as MainData, which stays the reference.
+    """
+
+    def __init__(self, header: Header, side_info: SideInfo, bytes_str: str, down_sample=1, downmix=None,
+                 stats: DecodeStats = None, state=None, transform=True, dtype=np.float64, buffers: dict = None):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError("dtype should be np.float32 or np.float64")
+        super().__init__(header, side_info, bytes_str, down_sample, downmix, stats, state, transform, buffers)
+
+    def requantization(self):
+        '''
+        vectorized MainData.requantization: the exponent of every frequency line is built per
+        scale factor band, then all lines are raised to the power of 4/3 at once.
+        '''
+        self.xr = [0] * 2
+        for gran in range(2):
+            self.xr[gran] = [0] * self.channel_num
+            for chan in range(self.channel_num):
+                channel = self.side_info.granules[gran].channels[chan]
+                bound = self.nonzero_bound[gran][chan]
+                scalefac_multiplier = (channel.scalefac_scale + 1) / 2
+                exponent = self._block('exponent', (576,), np.float64)
+                if channel.windows_switching_flag and channel.block_type == BlockTypeInfo.THREE_SHORT_WINDOWS:
+                    # short block
+                    sfb_indicies = self.scale_band_indicies[self.header.sampling_rate_frequency]['S']
+                    loop_idx = 0
+                    for sfb in range(len(sfb_indicies) - 1):
+                        width = sfb_indicies[sfb + 1] - sfb_indicies[sfb]
+                        scalefac = self.scalefac_s[gran][chan][sfb]
+                        for window in range(3):
+                            a = (channel.global_gain - 210 - (channel.subblock_gain[window] << 3)) / 4
+                            b = -(scalefac_multiplier * scalefac[window])
+                            exponent[loop_idx:loop_idx + width] = a + b
+                            loop_idx += width
+                else:
+                    # long blocks
+                    sfb_indicies = self.scale_band_indicies[self.header.sampling_rate_frequency]['L']
+                    c = (channel.global_gain - 210) / 4
+                    for sfb in range(len(sfb_indicies) - 1):
+                        d = -(scalefac_multiplier * (self.scalefac_l[gran][chan][sfb] +
+                                                     channel.preflag * self.pretab[sfb]))
+                        exponent[sfb_indicies[sfb]:sfb_indicies[sfb + 1]] = c + d
+
+                lines = self._block('quantized', (576,), np.int64)[:bound]
+                lines[:] = self.frequency_lines[gran][chan][:bound]
+                exponent = exponent[:bound]
+                xr = self._block('xr', (2, 2, 576))[gran, chan]
+                xr[bound:] = 0
+                # too small exponents give zero, same as requantize_s/requantize_l.
+                scale = np.where(exponent < -127, 0, np.exp2(exponent)).astype(self.dtype)
+                xr[:bound] = np.sign(lines) * pow43(self.dtype)[np.abs(lines)] * scale
+                self.xr[gran][chan] = xr
+
+    def aliasing_reduction(self):
+        '''
+        vectorized MainData.aliasing_reduction: the butterflies of all boundaries of a granule's
+        channels are computed at once.
+        '''
+        for gran in range(2):
+            channels = [self.side_info.granules[gran].channels[chan] for chan in range(len(self.xr[gran]))]
+            sblimits = np.array([alias_sblimit(channel) for channel in channels])
+            xr = np.stack([np.asarray(x, dtype=self.dtype) for x in self.xr[gran]])
+            self.xr[gran] = list(alias_reduce(xr, sblimits, self.dtype))
+            for chan, sblimit in enumerate(sblimits):
+                self._alias_bound(gran, chan, min(sblimit, self._nonzero_subbands(gran, chan) + 1))
+
+    def IMDCT(self):
+        '''
+        vectorized MainData.IMDCT: the non-zero subbands of all channels of a granule are transformed
+        by one matrix product per block type, then overlapped with the tails kept in self.state.
+        '''
+        tables = imdct_tables(self.dtype)
+        overlap = np.asarray(self.state.overlap, dtype=self.dtype)
+        self.samples = [0] * 2
+        self.active_subbands = [0] * 2
+        for gran in range(2):
+            channels = len(self.xr[gran])
+            if channels > self.channel_num:
+                # channels left apart by the mono downmix both continue the mixed overlap, see _downmix_samples.
+                overlap[1] = overlap[0]
+                self.state.active[1] = self.state.active[0]
+            nonzero_subbands = [self._nonzero_subbands(gran, chan) for chan in range(channels)]
+            block_types = np.array([self.side_info.granules[gran].channels[chan].block_type
+                                    for chan in range(channels)])
+            transformed = max(nonzero_subbands)
+            X = np.stack([np.asarray(x, dtype=self.dtype) for x in self.xr[gran]]).reshape(channels, 32, 18)
+            z = self._block('z', (channels, 32, 36))
+            z[:, :transformed] = imdct_blocks(X[:, :transformed], block_types, tables)
+            z[:, transformed:] = 0
+            self.samples[gran] = np.add(z[..., :18], overlap[:channels],
+                                        out=self._block('samples%d' % gran, (channels, 32, 18)))
+            overlap[:channels] = z[..., 18:]
+            self.active_subbands[gran] = [max(nonzero, active)
+                                          for nonzero, active in zip(nonzero_subbands, self.state.active)]
+            self.state.active[:channels] = nonzero_subbands
+            self.state.overlap = overlap
+            if channels > self.channel_num:
+                self._downmix_samples(gran)
+                self.nonzero_bound[gran] = [max(self.nonzero_bound[gran])]
+                overlap = self.state.overlap
+
+    def _downmix_samples(self, gran):
+        self.samples[gran] = self._average(*self.samples[gran])[np.newaxis]
+        self.active_subbands[gran] = [max(self.active_subbands[gran])]
+        overlap = np.asarray(self.state.overlap, dtype=self.dtype)
+        overlap[0] = self._average(*overlap)
+        self.state.overlap = overlap
+        self.state.active[0] = max(self.state.active)
+
+    def _average(self, left, right):
+        return (np.asarray(left, dtype=self.dtype) + np.asarray(right, dtype=self.dtype)) / 2
+
+    def frequency_inversion(self):
+        for gran in range(2):
+            # samples may come from the list based MainData.IMDCT when stages are mixed, see backends.py.
+            self.samples[gran] = np.asarray(self.samples[gran], dtype=self.dtype)
+            self.samples[gran][:, 1::2, 1::2] *= -1
+
+    def synthesis(self):
+        '''
+        vectorized MainData.synthesis: the 18 V vectors of a granule are one matrix product, the
+        window is applied as 16 shifted multiply-adds over them and the FIFO kept in self.state.
+        '''
+        subbands = self.subbands
+        tables = synthesis_tables(subbands, self.dtype)
+        fifo = np.asarray(self.state.fifo, dtype=self.dtype)
+        pcm_output = self._block('pcm', (2, self.channel_num, 18 * subbands))
+        for gran in range(2):
+            S = np.asarray(self.samples[gran], dtype=self.dtype)[:self.channel_num, :subbands].transpose(0, 2, 1)
+            pcm, fifo[:self.channel_num] = synthesize(S, fifo[:self.channel_num], tables)
+            pcm_output[gran] = pcm.reshape(self.channel_num, -1)
+        self.state.fifo = fifo
+        self.pcm_output = pcm_output.reshape(-1)
+
+    def _block(self, name: str, shape: tuple, dtype=None) -> np.ndarray:
+        '''
+        output array of a stage kept in self.buffers, reused by the next frames while its shape stays the same.
+        dtype: self.dtype if None.
+        '''
+        dtype = self.dtype if dtype is None else dtype
+        block = self.buffers.get(name)
+        if block is None or block.shape != shape or block.dtype != dtype:
+            block = self.buffers[name] = np.empty(shape, dtype=dtype)
+        return block
+
+    @staticmethod
+    def batch_transform(frames: list):
+        '''
+        run the transform stages of consecutive frames of a stream, decoded with transform=False.
+        Runs of frames with the same channels are stacked and go through aliasing reduction, IMDCT
+        and synthesis as (granules, channels, ...) arrays, the state is threaded through in order.
+        Frames whose channels a mono downmix left apart are transformed alone.
+        '''
+        run = []
+        for frame in frames:
+            if all(len(frame.xr[gran]) == frame.channel_num for gran in range(2)) and \
+                    (not run or frame.channel_num == run[0].channel_num):
+                run.append(frame)
+                continue
+            _transform_run(run)
+            run = []
+            if all(len(frame.xr[gran]) == frame.channel_num for gran in range(2)):
+                run.append(frame)
+            else:
+                frame.run_stages(frame.transform_stages())
+        _transform_run(run)
+
+
+def alias_reduce(xr: np.ndarray, sblimits: np.ndarray, dtype) -> np.ndarray:
+    '''
+    aliasing reduction of rows of 576 frequency lines, row r has butterflies on the boundaries 1 .. sblimits[r]-1.
+    '''
+    cs, ca = alias_tables(dtype)
+    lo, hi = xr[:, ALIAS_LO], xr[:, ALIAS_HI]
+    butterflies = (np.arange(1, 32) < sblimits.reshape(-1, 1))[:, :, np.newaxis]
+    xr = xr.copy()
+    xr[:, ALIAS_LO] = np.where(butterflies, lo * cs - hi * ca, lo)
+    xr[:, ALIAS_HI] = np.where(butterflies, hi * cs + lo * ca, hi)
+    return xr
+
+
+def imdct_blocks(X: np.ndarray, block_types: np.ndarray, tables: dict) -> np.ndarray:
+    '''
+    windowed IMDCT of rows of subbands: X (rows, subbands, 18) -> (rows, subbands, 36), rows are grouped by block type.
+    '''
+    z = np.zeros(X.shape[:-1] + (36,), dtype=X.dtype)
+    for block_type in np.unique(block_types):
+        rows = block_types == block_type
+        if block_type == BlockTypeInfo.THREE_SHORT_WINDOWS:
+            # short blocks, every window transforms the first 6 lines from its offset.
+            y = [(X[rows][..., window * 6:window * 6 + 6] @ tables['short'].T) * tables['short_window']
+                 for window in range(3)]
+            z[rows, :, 6:12] = y[0][..., :6]
+            z[rows, :, 12:18] = y[0][..., 6:] + y[1][..., :6]
+            z[rows, :, 18:24] = y[1][..., 6:] + y[2][..., :6]
+            z[rows, :, 24:30] = y[2][..., 6:]
+        else:
+            if block_type not in tables['long_windows']:
+                raise Exception
+            z[rows] = (X[rows] @ tables['long'].T) * tables['long_windows'][block_type]
+    return z
+
+
+def synthesize(S: np.ndarray, fifo: np.ndarray, tables: tuple) -> tuple:
+    '''
+    synthesis filterbank over consecutive blocks: S (channels, blocks, N) subband samples, fifo (channels, 16, 2N)
+    the V vectors before them, newest first. returns PCM (channels, blocks, N) and the new fifo.
+    '''
+    dct, window = tables
+    blocks, subbands = S.shape[1:]
+    # every V vector, oldest first: the block at t uses the 16 vectors ending at 15 + t.
+    V = np.concatenate([fifo[:, 14::-1], S @ dct.T], axis=1)
+    pcm = np.zeros(S.shape, dtype=S.dtype)
+    for i in range(16):
+        half = (i % 2) * subbands
+        pcm += V[:, 15 - i:15 - i + blocks, half:half + subbands] * window[i * subbands:(i + 1) * subbands]
+    return pcm, V[:, :-17:-1]
+
+
+def _transform_run(frames: list):
+    if not frames:
+        return
+    first = frames[0]
+    dtype, subbands, channels, state = first.dtype, first.subbands, first.channel_num, first.state
+    granules = [(frame, gran) for frame in frames for gran in range(2)]
+    side_info = [[frame.side_info.granules[gran].channels[chan] for chan in range(channels)]
+                 for frame, gran in granules]
+    xr = np.array([[np.asarray(x, dtype=dtype) for x in frame.xr[gran]] for frame, gran in granules], dtype=dtype)
+    sblimits = np.array([[alias_sblimit(channel) for channel in row] for row in side_info])
+    xr = alias_reduce(xr.reshape(-1, 576), sblimits.reshape(-1), dtype).reshape(len(granules), channels, 32, 18)
+    for (frame, gran), row in zip(granules, sblimits):
+        for chan, sblimit in enumerate(row):
+            frame._alias_bound(gran, chan, min(sblimit, frame._nonzero_subbands(gran, chan) + 1))
+    nonzero_subbands = np.array([[frame._nonzero_subbands(gran, chan) for chan in range(channels)]
+                                 for frame, gran in granules])
+
+    # IMDCT of all granules, the first one overlaps with the tail of the previous frame.
+    transformed = nonzero_subbands.max()
+    block_types = np.array([[channel.block_type for channel in row] for row in side_info])
+    z = np.zeros((len(granules), channels, 32, 36), dtype=dtype)
+    rows = len(granules) * channels
+    z[:, :, :transformed] = imdct_blocks(xr[:, :, :transformed].reshape(rows, transformed, 18),
+                                         block_types.reshape(rows), imdct_tables(dtype)
+                                         ).reshape(len(granules), channels, transformed, 36)
+    overlap = np.asarray(state.overlap, dtype=dtype)
+    samples = z[..., :18] + np.concatenate([overlap[np.newaxis, :channels], z[:-1, ..., 18:]])
+    overlap[:channels] = z[-1, ..., 18:]
+    state.overlap = overlap
+    state.active[:channels] = nonzero_subbands[-1].tolist()
+    samples[:, :, 1::2, 1::2] *= -1
+
+    # synthesis of all blocks of a channel in one sequence.
+    S = samples[:, :, :subbands].transpose(1, 0, 3, 2).reshape(channels, len(granules) * 18, subbands)
+    fifo = np.asarray(state.fifo, dtype=dtype)
+    pcm, fifo[:channels] = synthesize(S, fifo[:channels], synthesis_tables(subbands, dtype))
+    state.fifo = fifo
+    pcm = pcm.reshape(channels, len(granules), 18 * subbands).transpose(1, 0, 2)
+    for i, frame in enumerate(frames):
+        frame.samples = list(samples[2 * i:2 * i + 2])
+        frame.pcm_output = pcm[2 * i:2 * i + 2].reshape(-1)
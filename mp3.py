@@ -1,9 +1,27 @@
 import argparse
-from PCM import PCM
-from header import Header, ChannelModeInfo
-from main_data import MainData
+import logging
+import sys
+from bisect import bisect_left
+from time import perf_counter_ns
+
+from PCM import PCM, NpySink, RawSink
+from activity import side_info_frames
+from header import ChannelModeInfo, InvalidEncodingError, parse_header
+from backends import BACKENDS, numpy_transforms
+from frame_decoder import FrameDecoder
 from side_info import SideInfo
 from utils.bit import byte2str
+from utils.log import framing_logger, enable_tracing, SUBSYSTEMS
+from utils.pipeline import threaded
+from utils.prefetch import PrefetchReader
+from utils.stats import DecodeStats
+
+
+# main_data_begin reaches at most 511 bytes back, seek frames the frames this many bytes before
+RESERVOIR_BYTES = 1024
+
+# blocks read ahead with prefetch
+PREFETCH_DEPTH = 4
 
 
 class MP3File(object):
@@ -11,8 +29,59 @@ class MP3File(object):
     MP3File : look for frames and break them up into headers and data, meanwhile decoding then into PCM.
     """
 
-    def __init__(self, mp3_file:str):
+    def __init__(self, mp3_file:str, down_sample=1, downmix=None, dtype=None, sample_format='s16', profile=False,
+                 backend=None, batch=None, pipeline=None, decoder=None, prefetch=None, sink=None):
+        '''
+        down_sample: 1, 2 or 4. Decode at full, half or quarter sampling rate by synthesizing
+        only the lower subbands, e.g. 44.1 kHz streams become 22.05 or 11.025 kHz PCM.
+        downmix: None or 'mono'. 'mono' mixes stereo streams down to a single channel before IMDCT.
+        dtype: np.float32 or np.float64, the float type the numpy and accelerated backends compute in,
+        np.float64 if None.
+        sample_format: output samples, one of PCM.sample_formats ('u8', 's16', 's24', 's32', 'f32').
+        profile: collect per-stage timing and counters, see stats().
+        backend: one of backends.BACKENDS ('reference', 'numpy', 'accelerated'), or a dict choosing the
+        backend of each stage group, see backends.py. None is 'numpy' when dtype is given, else 'reference'.
+        batch: None or a number of frames. Frames are decoded up to their frequency lines, then every
+        batch of them goes through aliasing reduction, IMDCT and synthesis as stacked NumPy arrays,
+        which needs the numpy or accelerated backend, also for the 'imdct' and 'synthesis' stage groups. Output is the same as frame by frame decoding.
+        pipeline: None or a queue depth. A second thread reads, frames and entropy decodes up to that many
+        frames ahead while this one runs the transforms and PCM conversion, so that the pure Python
+        front end overlaps with NumPy code releasing the GIL. Output is the same as without it.
+        decoder: None or a FrameDecoder to decode with, e.g. the one of the previous file of a worker.
+        It is reset, and its down_sample, downmix, backend and dtype are used instead of the arguments.
+        prefetch: None or a block size in bytes, e.g. 1 << 20. A thread reads the file in blocks that large,
+        a few ahead of the framer, so that slow storage (network filesystems, disks) doesn't stall decoding.
+        sink: None or where the samples go instead of a PCM buffer kept for save_as_wav, e.g. PCM.RawSink,
+        PCM.ArraySink or PCM.NpySink. Array sinks without a length are sized with length().
+        '''
+        if sample_format not in PCM.sample_formats:
+            raise ValueError("sample_format should be one of %s" % list(PCM.sample_formats))
+        if decoder is None:
+            if backend is None:
+                backend = 'reference' if dtype is None else 'numpy'
+            decoder = FrameDecoder(down_sample, downmix, backend, dtype)
+        else:
+            decoder.reset()
+        self.decoder = decoder
+        self.main_data_class = decoder.main_data_class
+        if batch is not None and not numpy_transforms(self.main_data_class):
+            raise ValueError("batch needs the numpy or accelerated backend for the imdct and synthesis stages")
+        if batch is not None and batch < 1:
+            raise ValueError("batch should be a positive number of frames")
+        if pipeline is not None and pipeline < 1:
+            raise ValueError("pipeline should be a positive queue depth")
+        if prefetch is not None and prefetch < 1:
+            raise ValueError("prefetch should be a positive block size")
         self.filename = mp3_file
+        self.down_sample = decoder.down_sample
+        self.downmix = decoder.downmix
+        self.dtype = decoder.dtype
+        self.batch = batch
+        self.pipeline = pipeline
+        self.prefetch = prefetch
+        self.sample_format = sample_format
+        self.decode_stats = DecodeStats() if profile else None
+        decoder.stats = self.decode_stats
         self.position = 0
         # open file, read data into header and data frame objects
         with open(mp3_file, 'rb') as audio:
@@ -22,7 +91,6 @@ class MP3File(object):
                 buf += audio.read(1)
             # should we save the start location of the mp3 data? Yes
             self.position = audio.tell() - 2
-        # print(self.position)
         self.previous_frame_size = 0
         # keep a buffer of main data from previous frames. when we need to read main data
         # we will follow one of the following:
@@ -30,103 +98,309 @@ class MP3File(object):
         #   - read the rest of the buffer, then some of the main data in the current physical frame
         #   - read the main data from immediately after the side information
         self.main_data_buffer = b''
-        self.PCM_buffer = PCM()
+        # IMDCT overlap and synthesis FIFO, carried from every frame to the next.
+        self.decoder_state = decoder.state
+        # see frame_index
+        self._frame_offsets = None
+        self._frame_samples = 0
+        self.PCM_buffer = PCM() if sink is None else sink
+        if getattr(sink, 'length', 0) is None:
+            sink.length = self.length()
 
     def read_frames(self, nframes=-1):
         """
         read n frames, save decoding PCM in PCM.buffer
         default: read all frames
         """
-        frames_count = 0
         if nframes == 0:
             return
-        with open(self.filename, 'rb') as audio:
+        # batched and pipelined frames leave their transform stages to this loop.
+        deferred = self.batch is not None or self.pipeline is not None
+        frames = self._decode_frames(nframes, transform=not deferred)
+        if self.pipeline is not None:
+            frames = threaded(frames, self.pipeline)
+        # frames waiting for their transform stages in batch mode
+        pending = []
+        try:
+            for main_data in frames:
+                if self.batch is not None:
+                    pending.append(main_data)
+                    if len(pending) == self.batch:
+                        batch, pending = pending, []
+                        self._transform_batch(batch)
+                    continue
+                if deferred:
+                    main_data.run_stages(main_data.transform_stages())
+                self._output([main_data])
+        finally:
+            frames.close()
+        # the last batch, fewer frames were left
+        self._transform_batch(pending)
+
+    def read_spectra(self, nframes=-1):
+        '''
+        generator of the MDCT spectra of the granules of the next nframes frames, all remaining frames if -1.
+        Frames stop after requantization, stereo processing and reordering: IMDCT, frequency inversion and
+        synthesis are skipped, and nothing is pushed to the PCM buffer.
+        Every spectrum is a (channels, 576) array, one channel with downmix='mono'. Lines of short blocks
+        are ordered as reorder leaves them, see side_info for the block type of each granule.
+        With down_sample > 1 only the lines of the synthesized subbands are decoded: lines 18 * 32 / down_sample
+        and above are zero.
+        The decoder state is not updated, read_frames after it doesn't continue the PCM seamlessly.
+        '''
+        import numpy as np
+
+        frames = self._decode_frames(nframes, transform=False)
+        if self.pipeline is not None:
+            frames = threaded(frames, self.pipeline)
+        try:
+            for main_data in frames:
+                if self.decode_stats is not None:
+                    self.decode_stats.count_frame(main_data)
+                for gran in range(2):
+                    spectrum = np.array(main_data.xr[gran], dtype=self.dtype or np.float64)
+                    if len(spectrum) > main_data.channel_num:
+                        # downmix of channels with different block types, which only IMDCT can mix
+                        spectrum = spectrum.mean(axis=0, keepdims=True)
+                    yield spectrum
+        finally:
+            frames.close()
+
+    def _decode_frames(self, nframes: int, transform=True, skip=0):
+        '''
+        generator of the MainData of the next nframes frames, all remaining frames if -1.
+        transform: False stops every frame after its spectral stages, and every frame is a new MainData.
+        Otherwise it is the MainData of self.decoder, which the next frame decodes again.
+        skip: the first skip of the nframes frames are only framed, filling the bit reservoir, see seek.
+        '''
+        frames_count = 0
+        trace = framing_logger.isEnabledFor(logging.DEBUG)
+        stats = self.decode_stats
+        with self._open() as audio:
             still_reading = True
             audio.seek(self.position)
-            while still_reading:
-                if frames_count == nframes:
-                    break
-                print("\n>>> Start decoding frame: %d"%frames_count)
-                print('reading header starting at byte offset: {}'.format(audio.tell()))
-                # Read the 4 header bytes
-                buf = audio.read(4)
-                bytes_str = byte2str(buf,4)
-                header = Header(bytes_str)
-                non_main_data_len = 4
-
-                if header.protection == '1':
-                    # TODO: CRC check
-                    audio.read(2)
-                    non_main_data_len += 2
-
-                # if mono: side info is 17 bytes; else: 32
-                side_info_length = 17 if header.channel_mode == ChannelModeInfo.MONO else 32
-                print("channel mode: ",header.channel_mode)
-                print("reading side info at byte offset: {}".format(audio.tell()))
-                side_info_bytes = audio.read(side_info_length)
-                bytes_str = byte2str(side_info_bytes,side_info_length)
-                side_info = SideInfo(bytes_str,header.channel_mode)
-
-                # print("side info granules: {}".format(side_info.granules))
-                # print("side info main_data_begin: {}".format(side_info.main_data_begin))
-                # print("side info scfsi_band: {}".format(side_info.scfsi))
-                non_main_data_len += side_info_length
-
-                main_data_length = header.frame_size - non_main_data_len # main data size in current frame
-                print("reading main data at byte offset: {}\ntotal bits length: {}".format(audio.tell(),main_data_length))
-                # read until the next header so we have all the main data we could possibly want
-
-                read_bytes_count = 0
-                while True:
-                    new_byte = audio.peek(1)
-                    if new_byte == b'':
-                        still_reading = False
+            try:
+                while still_reading:
+                    if frames_count == nframes:
                         break
-                    # if self.main_data_buffer == b'':
-                    if read_bytes_count==0:
-                        self.main_data_buffer += audio.read(2)
-                        read_bytes_count+=2
+                    if stats is not None:
+                        frame_start = perf_counter_ns()
+                    if trace:
+                        framing_logger.debug(">>> Start decoding frame: %d, reading header starting at byte offset: %d",
+                                             frames_count, audio.tell())
+                    # Read the 4 header bytes
+                    buf = audio.read(4)
+                    header = parse_header(int.from_bytes(buf, byteorder='big'))
+                    non_main_data_len = 4
+
+                    if header.protection == '0':
+                        # protection bit unset: 16 bits CRC follow the header
+                        # TODO: CRC check
+                        audio.read(2)
+                        non_main_data_len += 2
+
+                    # if mono: side info is 17 bytes; else: 32
+                    side_info_length = 17 if header.channel_mode == ChannelModeInfo.MONO else 32
+                    if trace:
+                        framing_logger.debug("channel mode: %s, reading side info at byte offset: %d",
+                                             header.channel_mode, audio.tell())
+                    side_info_bytes = audio.read(side_info_length)
+                    side_info = SideInfo(side_info_bytes,header.channel_mode)
+
+                    non_main_data_len += side_info_length
+
+                    main_data_length = header.frame_size - non_main_data_len # main data size in current frame
+                    if trace:
+                        framing_logger.debug("reading main data at byte offset: %d, total bits length: %d",
+                                             audio.tell(), main_data_length)
+                    # read until the next header so we have all the main data we could possibly want
+
+                    read_bytes_count = 0
+                    while True:
+                        if read_bytes_count == 0:
+                            # the main data of this frame in one read, then byte by byte up to the next frame
+                            new_bytes = audio.read(max(main_data_length, 2))
+                        else:
+                            new_bytes = audio.read(1)
+                        if new_bytes == b'':
+                            still_reading = False
+                            break
+                        self.main_data_buffer += new_bytes
+                        read_bytes_count += len(new_bytes)
+
+                        if read_bytes_count >= main_data_length and self._is_header(self.main_data_buffer[-2:] + audio.peek(2)[:2]):
+                            # we've stumbled upon a new frame. return the file back to the start
+                            # of the header and remove the last two bytes from the main data buffer
+                            if trace:
+                                framing_logger.debug('- read bytes: %d, find next frame, current position: %d -',
+                                                     read_bytes_count, audio.tell() - 2)
+                            audio.seek(audio.tell() - 2)
+                            self.main_data_buffer = self.main_data_buffer[:-2]
+                            break
+                    # At this point, we now have all the main data up until the start of the next frame
+
+                    # calculate the position at which to start reading the main data
+                    # then read the main data into a buffer and send that buffer somewhere
+                    # so that we might one day hope to know the scaling factors
+                    if trace:
+                        framing_logger.debug("- main_data_begin:%-5d frame_size:%-5d main_data_length:%-5d -",
+                                             side_info.main_data_begin, header.frame_size, main_data_length)
+
+                    # main_data_bytes = self.main_data_buffer[:main_data_length]
+                    # self.main_data_buffer = self.main_data_buffer[main_data_length:] # remaining data would be used in next frame.
+
+                    # TODO: check data length
+                    this_frame_data_length = side_info.main_data_begin+main_data_length
+                    main_data_bytes = self.main_data_buffer[-this_frame_data_length:]
+                    self.main_data_buffer = self.main_data_buffer[-this_frame_data_length:]
+                    if frames_count < skip:
+                        frames_count += 1
+                        continue
+
+                    bytes_str = byte2str(main_data_bytes,this_frame_data_length)
+                    if trace:
+                        framing_logger.debug("- main data buffer size:%d, main data length:%d",
+                                             len(main_data_bytes), this_frame_data_length)
+                    if stats is not None:
+                        stats.add_stage_time('framing', perf_counter_ns() - frame_start)
+                    if transform:
+                        self.decoder.decode(header, side_info, bytes_str)
+                        main_data = self.decoder.frame
                     else:
-                        self.main_data_buffer += audio.read(1)
-                        read_bytes_count+=1
-
-                    if read_bytes_count >= main_data_length and not self._is_not_frame_start(self.main_data_buffer[-2], self.main_data_buffer[-1]):
-                        # we've stumbled upon a new frame. return the file back to the start
-                        # of the header and remove the last two bytes from the main data buffer
-                        print('- read bytes: %d, find next frame, current position: %d -'%(read_bytes_count,audio.tell()-2))
-                        audio.seek(audio.tell() - 2)
-                        self.main_data_buffer = self.main_data_buffer[:-2]
-                        break
-                # At this point, we now have all the main data up until the start of the next frame
+                        main_data = self.decoder.spectra(header, side_info, bytes_str)
+                    frames_count+=1
+                    yield main_data
+            finally:
+                self.position = audio.tell()
 
-                # calculate the position at which to start reading the main data
-                # then read the main data into a buffer and send that buffer somewhere
-                # so that we might one day hope to know the scaling factors
-                print("- main_data_begin:%-5d frame_size:%-5d main_data_length:%-5d -"
-                      %(side_info.main_data_begin,header.frame_size, main_data_length))
+    def _open(self):
+        if self.prefetch is None:
+            return open(self.filename, 'rb')
+        # reading ahead from where decoding continues, the seek to self.position stays in the buffer
+        return PrefetchReader(self.filename, self.prefetch, PREFETCH_DEPTH, position=self.position)
+
+    def frame_index(self) -> list:
+        '''
+        byte offsets of all frames, found from their headers without decoding. Built once, seek and peaks reuse it.
+        '''
+        if self._frame_offsets is None:
+            frames = [(offset, header.samples_per_frame) for offset, header, _ in side_info_frames(self.filename)]
+            self._frame_offsets = [offset for offset, _ in frames]
+            self._frame_samples = frames[0][1] if frames else 0
+        return self._frame_offsets
 
-                # main_data_bytes = self.main_data_buffer[:main_data_length]
-                # self.main_data_buffer = self.main_data_buffer[main_data_length:] # remaining data would be used in next frame.
+    def length(self) -> int:
+        '''
+        samples per channel of the frames from the decoding position to the end, counted with frame_index().
+        '''
+        offsets = self.frame_index()
+        frames = len(offsets) - bisect_left(offsets, self.position)
+        return frames * self._frame_samples // self.down_sample
+
+    def seek(self, frame: int):
+        '''
+        continue decoding at frame, counted from 0. The PCM read after it is the same as when decoding from
+        the start: the frames whose main data the bit reservoir of the previous frame may reach into are
+        framed, and the previous frame is decoded without output to fill the IMDCT overlap and synthesis FIFO.
+        '''
+        offsets = self.frame_index()
+        if not 0 <= frame < len(offsets):
+            raise ValueError("frame should be in [0, %d)" % len(offsets))
+        previous = max(frame - 1, 0)
+        first = previous
+        while first > 0 and offsets[previous] - offsets[first] < RESERVOIR_BYTES:
+            first -= 1
+        self.decoder.reset()
+        self.main_data_buffer = b''
+        self.position = offsets[first]
+        for _ in self._decode_frames(frame - first, skip=previous - first):
+            pass
 
-                # TODO: check data length
-                this_frame_data_length = side_info.main_data_begin+main_data_length
-                main_data_bytes = self.main_data_buffer[-this_frame_data_length:]
-                self.main_data_buffer = self.main_data_buffer[-this_frame_data_length:]
+    def peaks(self, buckets=1000, accuracy='exact', start=0, stop=None):
+        '''
+        waveform overview of the frames start .. stop (the end if None): a (buckets, 2) array of the minimum
+        and maximum sample of every bucket, over all channels, full scale 1.0. Buckets without samples are 0.
+        Frames are decoded one at a time into the buckets, in constant memory, by a separate decoder starting
+        at start through frame_index(), so that a partial refresh decodes only its frames. The decoding position
+        of this MP3File doesn't move.
+        accuracy: 'exact' decodes as read_frames does. 'approximate' transforms and synthesizes only the lower
+        8 subbands of the mono downmix (down_sample=4, downmix='mono'), missing the treble and the peaks of
+        channels out of phase. Huffman decoding stops at those subbands too, the scale factors are still read.
+        '''
+        import numpy as np
 
-                bytes_str = byte2str(main_data_bytes,this_frame_data_length)
-                print("- main data buffer size:%d"%len(main_data_bytes))
-                print("- main data length:%d" % (this_frame_data_length))
-                main_data = MainData(header, side_info, bytes_str)
+        if accuracy not in ('exact', 'approximate'):
+            raise ValueError("accuracy should be 'exact' or 'approximate'")
+        if buckets < 1:
+            raise ValueError("buckets should be a positive number")
+        offsets = self.frame_index()
+        stop = len(offsets) if stop is None else min(stop, len(offsets))
+        peaks = np.zeros((buckets, 2))
+        if start >= stop:
+            return peaks
+        decoder = self.decoder
+        if accuracy == 'approximate':
+            decoder = FrameDecoder(4, 'mono', decoder.backend, decoder.dtype)
+        else:
+            decoder = FrameDecoder(decoder.down_sample, decoder.downmix, decoder.backend, decoder.dtype)
+        reader = MP3File(self.filename, decoder=decoder, prefetch=self.prefetch)
+        reader._frame_offsets, reader._frame_samples = offsets, self._frame_samples
+        reader.seek(start)
+        peaks[:, 0], peaks[:, 1] = np.inf, -np.inf
+        total = None
+        position = 0
+        for main_data in reader._decode_frames(stop - start):
+            pcm = np.asarray(main_data.pcm_output).reshape(2, main_data.channel_num, -1)
+            samples = pcm.transpose(1, 0, 2).reshape(main_data.channel_num, -1)
+            if total is None:
+                total = samples.shape[1] * (stop - start)
+            # first sample of every bucket this frame reaches into
+            bucket = np.arange(position, position + samples.shape[1]) * buckets // total
+            bounds = np.flatnonzero(np.diff(bucket, prepend=-1))
+            rows = bucket[bounds]
+            peaks[rows, 0] = np.minimum(peaks[rows, 0], np.minimum.reduceat(samples.min(axis=0), bounds))
+            peaks[rows, 1] = np.maximum(peaks[rows, 1], np.maximum.reduceat(samples.max(axis=0), bounds))
+            position += samples.shape[1]
+        peaks[np.isinf(peaks)] = 0
+        return peaks
 
-                if not self.PCM_buffer.is_init:
-                    # provide information, e.g. sampling rate
-                    # TODO: check sampling rate
-                    self.PCM_buffer.set_params(main_data.channel_num,2,16000)
-                self.PCM_buffer.push(main_data.pcm_output)
+    def _transform_batch(self, frames: list):
+        if not frames:
+            return
+        if self.decode_stats is not None:
+            start = perf_counter_ns()
+        self.main_data_class.batch_transform(frames)
+        if self.decode_stats is not None:
+            self.decode_stats.add_stage_time('batch_transform', perf_counter_ns() - start)
+        self._output(frames)
 
-                frames_count+=1
+    def _output(self, frames: list):
+        '''
+        push the PCM of decoded frames to the PCM buffer.
+        '''
+        stats = self.decode_stats
+        for main_data in frames:
+            if stats is not None:
+                stats.count_frame(main_data)
+                output_start = perf_counter_ns()
+            if not self.PCM_buffer.is_init:
+                # provide information, e.g. sampling rate
+                sampwidth, float_format = PCM.sample_formats[self.sample_format]
+                self.PCM_buffer.set_params(main_data.channel_num, sampwidth,
+                                           main_data.header.sampling_rate_frequency // self.down_sample, float_format)
+            # pcm_output holds each granule's channels one after another, full scale is 1.0.
+            self.PCM_buffer.push(main_data.pcm_output, blocks=2, scale=32768)
+            if stats is not None:
+                stats.add_stage_time('pcm_output', perf_counter_ns() - output_start)
 
-            self.position = audio.tell()
+    def stats(self) -> dict:
+        '''
+        per-stage cumulative time in ns and decoding counters of all frames read so far,
+        None unless the file was opened with profile=True.
+        '''
+        if self.decode_stats is None:
+            return None
+        return self.decode_stats.as_dict()
 
     def _is_not_frame_start(self, byte1, byte2):
         '''
@@ -134,6 +408,19 @@ class MP3File(object):
         '''
         return (byte1 != 0xFF or (byte2 & 0xF0 != 240 and byte2 & 0xE0 != 224))
 
+    def _is_header(self, word: bytes) -> bool:
+        '''
+        word starts a frame: sync bits and a valid header, so that main data ending with 0xFF before
+        the next header doesn't start a frame one byte early.
+        '''
+        if len(word) < 4 or self._is_not_frame_start(word[0], word[1]):
+            return False
+        try:
+            parse_header(int.from_bytes(word, byteorder='big'))
+        except InvalidEncodingError:
+            return False
+        return True
+
     def save_as_wav(self,filename:str):
         '''
         save decoding PCM as .wav format file
@@ -145,9 +432,58 @@ class MP3File(object):
 if __name__=='__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("mp3file",help="the MP3's file path")
+    parser.add_argument("--down-sample", type=int, default=1, choices=[1, 2, 4],
+                        help="decode at 1/N of the sampling rate, synthesizing only the lower 32/N subbands")
+    parser.add_argument("--downmix", choices=['mono'], default=None,
+                        help="mix stereo streams down to a single channel")
+    parser.add_argument("--backend", choices=list(BACKENDS), default=None,
+                        help="decoding backend, pure python 'reference' by default")
+    parser.add_argument("--dtype", choices=['float32', 'float64'], default=None,
+                        help="float type of the numpy and accelerated backends, implies 'numpy' without --backend")
+    parser.add_argument("--batch", type=int, default=None,
+                        help="transform N frames at a time as stacked arrays, needs the numpy or accelerated backend")
+    parser.add_argument("--pipeline", type=int, default=None, metavar='DEPTH',
+                        help="entropy decode in a second thread, up to DEPTH frames ahead of the transforms")
+    parser.add_argument("--spectra", action='store_true',
+                        help="save the MDCT spectra of every granule as a .npy instead of decoding to .wav")
+    parser.add_argument("--prefetch", type=int, default=None, metavar='BYTES',
+                        help="read the file in blocks of BYTES in a second thread, ahead of decoding")
+    parser.add_argument("--output", choices=['wav', 'raw', 'npy'], default=None,
+                        help="write a .wav (the default), raw interleaved little-endian samples (.pcm), or a NumPy .npy")
+    parser.add_argument("--format", choices=list(PCM.sample_formats), default='s16',
+                        help="sample format of the decoded output, whichever --output")
+    parser.add_argument("-v", "--verbose", action='store_true',
+                        help="print decoding traces of every frame")
+    parser.add_argument("--trace", action='append', choices=list(SUBSYSTEMS),
+                        help="print decoding traces of a subsystem only, may be repeated. -v traces all of them")
+    parser.add_argument("--profile", action='store_true',
+                        help="print the time spent in every decoding stage")
     args = parser.parse_args()
+    if args.spectra and args.output is not None:
+        parser.error("--spectra saves a .npy of its own, it can't be combined with --output")
+    args.output = args.output or 'wav'
+    if args.verbose:
+        # every subsystem, whichever --trace also names
+        enable_tracing()
+    elif args.trace:
+        enable_tracing(*args.trace)
     mp3_file=args.mp3file
     print(mp3_file)
-    mp3 = MP3File(mp3_file)
+    output = mp3_file[:-4] + {'wav': '.wav', 'raw': '.pcm', 'npy': '.npy'}[args.output]
+    sink = {'wav': None, 'raw': RawSink, 'npy': NpySink}[args.output]
+    mp3 = MP3File(mp3_file, down_sample=args.down_sample, downmix=args.downmix, dtype=args.dtype,
+                  sample_format=args.format, profile=args.profile, backend=args.backend, batch=args.batch,
+                  pipeline=args.pipeline, prefetch=args.prefetch, sink=sink and sink(output))
+    if args.spectra:
+        import numpy as np
+        np.save(mp3_file[:-4] + '.npy', np.stack(list(mp3.read_spectra())))
+        print(">>> save spectra: %s" % (mp3_file[:-4] + '.npy'))
+        sys.exit()
     mp3.read_frames()
-    mp3.save_as_wav(mp3_file[:-4]+'.wav')
\ No newline at end of file
+    if args.profile:
+        print(mp3.decode_stats.report(), file=sys.stderr)
+    if sink is None:
+        mp3.save_as_wav(output)
+    else:
+        mp3.PCM_buffer.close()
+    print(">>> save decoding result: %s" % output)
\ No newline at end of file
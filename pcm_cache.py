@@ -0,0 +1,140 @@
+'''
+content-addressed cache of decoded PCM, shared by the workers of a machine through a local directory.
+
+An entry is the .npy of a stream decoded with some options (see PCMCache.decode), named by the hash of
+its audio frames, without the ID3 or other tags around them, and of those options. Entries are written
+to a temporary file and renamed, so readers only ever see complete files. Every hit touches its entry, and
+the least recently used entries are removed once the directory holds more than max_bytes.
+'''
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from PCM import NpySink
+from activity import side_info_frames
+from mp3 import MP3File
+
+# part of every key, changed when decoding changes the PCM of a stream
+CACHE_VERSION = 1
+# MP3File options which change the PCM and their defaults, the others (batch, pipeline, prefetch)
+# only change how fast it comes
+KEY_OPTIONS = {'down_sample': 1, 'downmix': None, 'dtype': None, 'sample_format': 's16', 'backend': None}
+# MP3File options the cache can't take: a decoder brings options of its own, and entries are their own sink
+UNCACHED_OPTIONS = ('decoder', 'sink')
+# temporary files untouched for this long were left by a crashed worker, see PCMCache.evict
+STALE_SECONDS = 24 * 3600
+
+
+class PCMCache(object):
+    """
+    decoded PCM as memory-mapped NumPy arrays, decoded once per distinct audio and options.
+    """
+
+    def __init__(self, directory: str, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def decode(self, mp3_file: str, **options):
+        '''
+        the samples of the whole stream as a read-only (length, nchannels) array mapped from the cache,
+        of the sample format's type. options are those of MP3File but decoder and sink, a miss decodes with them.
+        A decode which doesn't fill the length counted from the frame headers raises ValueError, and leaves no entry.
+        '''
+        import numpy as np
+
+        path = self.path(mp3_file, **options)
+        try:
+            os.utime(path)
+            return np.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            pass
+        handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        os.close(handle)
+        try:
+            sink = NpySink(temporary)
+            try:
+                MP3File(mp3_file, sink=sink, **options).read_frames()
+            finally:
+                sink.close()
+            if sink.nframes != sink.length:
+                raise ValueError("%s decoded to %d of its %d samples per channel" %
+                                 (mp3_file, sink.nframes, sink.length))
+            # mapped before the rename, the mapping stays valid when another worker evicts the entry
+            samples = np.load(temporary, mmap_mode='r')
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self.evict()
+        return samples
+
+    def path(self, mp3_file: str, **options) -> str:
+        '''
+        the file of the entry of mp3_file decoded with options.
+        '''
+        return os.path.join(self.directory, self.key(mp3_file, **options) + '.npy')
+
+    def key(self, mp3_file: str, **options) -> str:
+        '''
+        hash of the audio frames of mp3_file and of the options changing its PCM.
+        '''
+        for name in UNCACHED_OPTIONS:
+            if name in options:
+                raise ValueError("%s is not an option of cached decoding" % name)
+        used = {name: options.get(name, default) for name, default in KEY_OPTIONS.items()}
+        if used['dtype'] is not None:
+            used['dtype'] = getattr(used['dtype'], '__name__', str(used['dtype']))
+        if used['backend'] is None:
+            used['backend'] = 'reference' if used['dtype'] is None else 'numpy'
+        digest = hashlib.sha256(json.dumps([CACHE_VERSION, used], sort_keys=True).encode())
+        digest.update(audio_frames(mp3_file))
+        return digest.hexdigest()
+
+    def evict(self):
+        '''
+        remove the least recently used entries until the cache holds at most max_bytes, and the
+        temporary files older than STALE_SECONDS.
+        '''
+        entries = []
+        stale = time.time() - STALE_SECONDS
+        for name in os.listdir(self.directory):
+            if not name.endswith(('.npy', '.tmp')):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+                if name.endswith('.tmp'):
+                    if stat.st_mtime < stale:
+                        os.remove(os.path.join(self.directory, name))
+                    continue
+            except FileNotFoundError:  # removed by another worker
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                # a worker still mapping the entry keeps reading it
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def audio_frames(mp3_file: str) -> bytes:
+    '''
+    the bytes from the first frame to the end of the last one, without the tags before and after them.
+    '''
+    first = end = None
+    for offset, header, _ in side_info_frames(mp3_file):
+        if first is None:
+            first = offset
+        end = offset + header.frame_size
+    if first is None:
+        return b''
+    with open(mp3_file, 'rb') as audio:
+        audio.seek(first)
+        return audio.read(end - first)
@@ -1,16 +1,20 @@
 import json
+import logging
 
 from header import ChannelModeInfo
-from utils.bit import Bit
-from enum import Enum
+from utils.bit import IntBit
+from utils.log import side_info_logger
+from enum import IntEnum
 
-DEBUG=True
-
-class BlockTypeInfo(Enum):
-    FORBIDDEN = '00'
-    START = ' 01'
-    THREE_SHORT_WINDOWS = '10'
-    END = '11'
+class BlockTypeInfo(IntEnum):
+    '''
+    block_type codes as read from the side info. Side info keeps the plain integer code,
+    which compares equal to these members.
+    '''
+    FORBIDDEN = 0  # normal long block, also used when windows_switching_flag isn't set
+    START = 1
+    THREE_SHORT_WINDOWS = 2
+    END = 3
 
 
 class ChanelSideInfo:
@@ -20,47 +24,47 @@ class ChanelSideInfo:
     The side information also includes additional values that will be used in the requantization formula to reconstruct the samples into real numbers.
     '''
 
-    def __init__(self, bits: Bit, idx: int):
+    __slots__ = ('index', 'part2_3_length', 'big_values', 'global_gain', 'scalefac_compress',
+                 'windows_switching_flag', 'block_type', 'mixed_block_flag', 'table_select', 'subblock_gain',
+                 'region0_count', 'region1_count', 'preflag', 'scalefac_scale', 'count1table_select')
+
+    def __init__(self, bits: IntBit, idx: int):
         self.index = idx
-        # bits = Bit(bytes_str)
         self.part2_3_length = bits.read_as_int(12)
-        if DEBUG:
-            print("- channel %d part2_3_length: %d"%(idx,self.part2_3_length))
         self.big_values = bits.read_as_int(9)
         self.global_gain = bits.read_as_int(8)
         self.scalefac_compress = bits.read_as_int(4)
-        self.windows_switching_flag = True if bits.read() == '1' else False
+        self.windows_switching_flag = bits.read_as_int(1) == 1
 
-        self.table_select = [0] * 3  # contain 5*2 bits or 5*3 bits
-        self.subblock_gain = [0] * 3  # may not be used
         if self.windows_switching_flag:
-            block_type = bits.read(2)
-
-            for block in BlockTypeInfo:
-                if block_type == block.value:
-                    self.block_type = block
-                    break
-
-            self.mixed_block_flag = True if bits.read() == '1' else False  # This field is only used when windows_switching_flag is set.
-            for i in range(2):
-                self.table_select[i] = bits.read_as_int(5)
-
-            if self.block_type == BlockTypeInfo.THREE_SHORT_WINDOWS:
-                for i in range(3):
-                    self.subblock_gain[i] = bits.read_as_int(3)
+            self.block_type = bits.read_as_int(2)
+            self.mixed_block_flag = bits.read_as_int(1) == 1  # This field is only used when windows_switching_flag is set.
+            # 5*2 bits of table_select, the third region is unused.
+            select = bits.read_as_int(10)
+            self.table_select = (select >> 5, select & 0x1f, 0)
+            # 3*3 bits of subblock_gain, only meaningful for short blocks.
+            gain = bits.read_as_int(9)
+            self.subblock_gain = (gain >> 6, (gain >> 3) & 0b111, gain & 0b111)
+            # region counts aren't transmitted, the implicit values of the standard are used.
+            if self.block_type == BlockTypeInfo.THREE_SHORT_WINDOWS and not self.mixed_block_flag:
+                self.region0_count = 8
+            else:
+                self.region0_count = 7
+            self.region1_count = 20 - self.region0_count
         else:
-            # TODO: check whether can we just set type as '00'
             # block type doesn't given
-            self.block_type=BlockTypeInfo.FORBIDDEN
-            for i in range(3):
-                self.table_select[i] = bits.read_as_int(5)
+            self.block_type = BlockTypeInfo.FORBIDDEN
+            self.mixed_block_flag = False
+            select = bits.read_as_int(15)
+            self.table_select = (select >> 10, (select >> 5) & 0x1f, select & 0x1f)
+            self.subblock_gain = (0, 0, 0)
             self.region0_count = bits.read_as_int(4)
             self.region1_count = bits.read_as_int(3)
         self.preflag = bits.read_as_int(1)
 
         # The scalefactors are logarithmically quantized with a step size of 2 or v2
         self.scalefac_scale = bits.read_as_int(1)
-        self.count1table_select = bits.read()
+        self.count1table_select = bits.read_as_int(1)
 
     def __str__(self):
         return json.dumps({
@@ -86,7 +90,9 @@ class Granule:
     MONO mode contain only one channel, else have two channel_num
     '''
 
-    def __init__(self, bits: Bit, idx:int, channel_num:int):
+    __slots__ = ('index', 'channels')
+
+    def __init__(self, bits: IntBit, idx:int, channel_num:int):
         self.index = idx
         self.channels=[ChanelSideInfo(bits, i) for i in range(channel_num)]
 
@@ -103,22 +109,36 @@ class SideInfo:
     The size depends on the encoded channel mode.
     '''
 
-    def __init__(self, bytes_str: str, channel_mode: ChannelModeInfo):
-        self._bits = Bit(bytes_str)
-        self.main_data_begin = self._bits.read_as_int(9) # bit reservoir, which enables the left over free space in the main data area of a frame to be used by consecutive frames.
+    __slots__ = ('main_data_begin', 'private_bits', 'scfsi', 'granules')
+
+    def __init__(self, bytes_str, channel_mode: ChannelModeInfo):
+        '''
+        bytes_str: the side info as bytes, or as a binary string.
+        '''
+        if isinstance(bytes_str, str):
+            bits = IntBit(int(bytes_str, 2), len(bytes_str))
+        else:
+            bits = IntBit(bytes_str)
+        self.main_data_begin = bits.read_as_int(9) # bit reservoir, which enables the left over free space in the main data area of a frame to be used by consecutive frames.
         if channel_mode == ChannelModeInfo.MONO:
-            self.private_bits = self._bits.read_as_int(5)
+            self.private_bits = bits.read_as_int(5)
         else:
-            self.private_bits = self._bits.read_as_int(3)
+            self.private_bits = bits.read_as_int(3)
         channel_num = 1 if channel_mode == ChannelModeInfo.MONO else 2
 
         # The ScaleFactor Selection Information determines weather the same scalefactors are transferred for both granules or not.
-        self.scfsi = [[self._bits.read_as_int(1) for _ in range(4)] for _ in range(channel_num)]
+        self.scfsi = []
+        for _ in range(channel_num):
+            scfsi = bits.read_as_int(4)
+            self.scfsi.append([scfsi >> 3, (scfsi >> 2) & 1, (scfsi >> 1) & 1, scfsi & 1])
 
-        self.granules=[Granule(self._bits,i,channel_num) for i in range(2)]
-        if DEBUG:
+        self.granules=[Granule(bits,i,channel_num) for i in range(2)]
+        if side_info_logger.isEnabledFor(logging.DEBUG):
             total_part2_3_length=0
             for gr in range(2):
-                for ch in range(2):
+                for ch in range(channel_num):
+                    side_info_logger.debug("- granule %d channel %d part2_3_length: %d",
+                                           gr, ch, self.granules[gr].channels[ch].part2_3_length)
                     total_part2_3_length+=self.granules[gr].channels[ch].part2_3_length
-            print("- total total_part2_3_length bits: %d, bytes: %.2f"%(total_part2_3_length,total_part2_3_length/8))
\ No newline at end of file
+            side_info_logger.debug("- total total_part2_3_length bits: %d, bytes: %.2f",
+                                   total_part2_3_length, total_part2_3_length/8)
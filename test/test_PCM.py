@@ -0,0 +1,80 @@
+import os
+import tempfile
+import wave
+
+import numpy as np
+
+from PCM import PCM, ArraySink, NpySink, RawSink, float2bytes
+
+
+def test_float2bytes():
+    # two blocks of a stereo frame, each block holds 2 samples of left then right
+    samples = [[[1.4, -2.6], [40000, -40000]],
+               [[0, 1], [2, 3]]]
+    assert np.frombuffer(float2bytes(samples), dtype='<i2').tolist() == \
+        [1, 32767, -3, -32768, 0, 2, 1, 3]
+    assert np.frombuffer(float2bytes([256, -256, 40000], 1), dtype=np.uint8).tolist() == [129, 127, 255]
+    assert np.frombuffer(float2bytes([1, -1], 4), dtype='<i4').tolist() == [65536, -65536]
+    assert float2bytes([1, -1], 3) == b'\x00\x01\x00\x00\xff\xff'
+    assert np.frombuffer(float2bytes([16384, -65536], 4, True), dtype='<f4').tolist() == [0.5, -1.0]
+
+
+def test_flush():
+    pcm = PCM()
+    pcm.set_params(2, 2, 44100)
+    pcm.push([[[1, 2], [3, 4]]])
+    assert pcm.nframes == 2
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'out.wav')
+        pcm.flush(filename)
+        with wave.open(filename) as wav:
+            assert wav.getparams()[:4] == (2, 2, 44100, 2)
+            assert np.frombuffer(wav.readframes(2), dtype='<i2').tolist() == [1, 3, 2, 4]
+
+        pcm.set_params(1, 4, 22050, float_format=True)
+        pcm.push([16384])
+        pcm.flush(filename)
+        with open(filename, 'rb') as wav:
+            data = wav.read()
+        assert data[:4] == b'RIFF' and data[8:12] == b'WAVE'
+        assert int.from_bytes(data[4:8], 'little') == len(data) - 8
+        assert int.from_bytes(data[20:22], 'little') == 3  # WAVE_FORMAT_IEEE_FLOAT
+        assert np.frombuffer(data[-4:], dtype='<f4').tolist() == [0.5]
+
+
+def test_sinks():
+    samples = [[[1, 2], [3, 4]]]
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'out.pcm')
+        raw = RawSink(filename)
+        raw.set_params(2, 2, 44100)
+        raw.push(samples)
+        raw.push(samples)
+        raw.close()
+        assert np.fromfile(filename, dtype='<i2').tolist() == [1, 3, 2, 4] * 2
+
+        # grown past its length
+        array = ArraySink(length=1)
+        array.set_params(2, 4, 44100, float_format=True)
+        for _ in range(3):
+            array.push(samples, scale=16384)
+        assert array.array.dtype == np.float32 and array.array.shape == (6, 2)
+        assert array.array[:2].tolist() == [[0.5, 1.0], [1.0, 1.0]]
+
+        filename = os.path.join(tmp, 'out.npy')
+        npy = NpySink(filename, length=3)
+        npy.set_params(2, 2, 44100)
+        npy.push(samples)
+        try:
+            npy.push(samples)
+            assert False, "more samples than the .npy holds"
+        except ValueError:
+            pass
+        npy.close()
+        assert np.load(filename).tolist() == [[1, 3], [2, 4], [0, 0]]
+
+
+if __name__ == '__main__':
+    test_float2bytes()
+    test_flush()
+    test_sinks()
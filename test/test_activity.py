@@ -0,0 +1,55 @@
+import os
+
+from activity import GranuleActivity, InvalidEncodingError, granule_activity, side_info_frames, silence_segments
+from mp3 import MP3File
+from util import song_path
+
+
+def test_side_info_frames():
+    # the frames walked by frame_size are the ones MP3File decodes, the ID3 tag is skipped.
+    mp3 = MP3File(song_path('seeusadness.mp3'), backend='numpy')
+    frames = mp3._decode_frames(20, transform=False)
+    walked = side_info_frames(song_path('seeusadness.mp3'))
+    for main_data, (offset, header, side_info) in zip(frames, walked):
+        assert header is main_data.header
+        assert str(side_info.granules[1]) == str(main_data.side_info.granules[1])
+    frames.close()
+    first, _, _ = next(side_info_frames(song_path('seeusadness.mp3')))
+    assert first == MP3File(song_path('seeusadness.mp3')).position
+    # MPEG 2 frames are walked to the end of the file, without side info
+    offset, header, side_info = list(side_info_frames(song_path('new_mp3.mp3')))[-1]
+    assert offset + header.frame_size == os.path.getsize(song_path('new_mp3.mp3'))
+    assert side_info is None
+    try:
+        granule_activity(song_path('new_mp3.mp3'))
+        assert False, "MPEG 2 side info is not supported"
+    except InvalidEncodingError:
+        pass
+
+
+def test_granule_activity():
+    granules = granule_activity(song_path('noid3.mp3'))
+    assert granules == [] or granules[0].time == 0
+    assert all(b.time > a.time for a, b in zip(granules, granules[1:]))
+    # the first frame holds the Xing header and codes nothing
+    assert granules[0].bits == 0 and granules[0].level < -200
+    assert max(granule.level for granule in granules) > -20
+
+
+def test_silence_segments():
+    def granule(num, level):
+        return GranuleActivity(num * 0.25, 0.25, level, 1000, 100)
+
+    levels = [-10, -80, -80, -80, -10, -90, -10, -85, -85, -85, -85]
+    granules = [granule(num, level) for num, level in enumerate(levels)]
+    assert silence_segments(granules, threshold=-60, min_duration=0.5) == [(0.25, 1.0), (1.75, 2.75)]
+    assert silence_segments(granules, threshold=-60, min_duration=0.8) == [(1.75, 2.75)]
+    quiet = GranuleActivity(0.0, 0.1, -30, 20, 0)
+    assert silence_segments([quiet] * 3, min_duration=0.1) == [(0.0, 0.1)]
+    assert silence_segments([]) == []
+
+
+if __name__ == '__main__':
+    test_side_info_frames()
+    test_granule_activity()
+    test_silence_segments()
@@ -0,0 +1,49 @@
+import numpy as np
+
+from backends import BACKENDS, backend_class, main_data_class
+from main_data import MainData
+from main_data_numpy import NumpyMainData
+from mp3 import MP3File
+from util import decode_pcm, song_path
+
+
+def test_main_data_class():
+    for name in BACKENDS:
+        assert main_data_class(name) is backend_class(name)
+    mixed = main_data_class({'huffman': 'accelerated', 'synthesis': 'numpy'})
+    assert mixed is main_data_class({'synthesis': 'numpy', 'huffman': 'accelerated'})
+    assert issubclass(mixed, NumpyMainData)
+    assert mixed.IMDCT is MainData.IMDCT
+    assert mixed.synthesis is NumpyMainData.synthesis
+    assert mixed.unpack_huffman is backend_class('accelerated').unpack_huffman
+    for backend in ['fast', {'huffman': 'fast'}, {'dct': 'numpy'}]:
+        try:
+            main_data_class(backend)
+            assert False
+        except ValueError:
+            pass
+
+
+def test_backends_match_reference():
+    # 16 frames reach past the silent start of the songs
+    for song in ['noid3.mp3', 'seeusadness.mp3']:
+        reference = decode_pcm(song, 16)
+        for backend in ['numpy', 'accelerated', {'huffman': 'accelerated'},
+                        {'imdct': 'numpy', 'synthesis': 'reference'}, {'requantization': 'numpy', 'synthesis': 'numpy'}]:
+            assert decode_pcm(song, 16, backend=backend) == reference
+
+
+def test_dtype_backend():
+    song = song_path('noid3.mp3')
+    assert MP3File(song, dtype=np.float32).main_data_class is NumpyMainData
+    try:
+        MP3File(song_path, dtype=np.float32, backend='reference')
+        assert False
+    except ValueError:
+        pass
+
+
+if __name__ == '__main__':
+    test_main_data_class()
+    test_backends_match_reference()
+    test_dtype_backend()
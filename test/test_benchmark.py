@@ -0,0 +1,17 @@
+from benchmark import compare
+
+
+def test_compare():
+    baseline = {'frames': 10, 'micro': {'IMDCT_numpy_us': 100.0},
+                'decode': {'noid3.mp3/numpy': {'frames_per_second': 200.0, 'peak_rss_kb': 1000, 'frames': 10}}}
+    results = {'frames': 5, 'micro': {'IMDCT_numpy_us': 105.0},
+               'decode': {'noid3.mp3/numpy': {'frames_per_second': 150.0, 'peak_rss_kb': 1500, 'frames': 5}}}
+    regressions = compare(results, baseline, 0.1)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('decode/noid3.mp3/numpy/frames_per_second')
+    assert regressions[1].startswith('decode/noid3.mp3/numpy/peak_rss_kb')
+    assert compare(baseline, baseline, 0.1) == []
+
+
+if __name__ == '__main__':
+    test_compare()
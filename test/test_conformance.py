@@ -0,0 +1,34 @@
+import math
+
+import numpy as np
+
+from conformance import SONGS, accuracy, checksums, compare_engine, decode_frames, frame_errors, load_golden
+
+
+def test_golden_checksums():
+    golden = load_golden()
+    for song in SONGS:
+        assert checksums(decode_frames(song, golden[song]['frames'])) == golden[song]
+
+
+def test_frame_errors():
+    reference = np.array([[0.5, -0.5], [0.25, 0.0]])
+    errors = frame_errors(reference, reference)
+    assert errors['max_abs'] == 0 and errors['snr_db'] == math.inf
+    errors = frame_errors(reference, reference + 2 ** -13)
+    assert errors['max_abs'] == 2 ** -13
+    assert accuracy([errors]) == 'limited'
+    assert accuracy([frame_errors(reference, reference + 0.01)]) == 'none'
+
+
+def test_engines_full_accuracy():
+    # the music starts at frame 13
+    for engine in ['numpy', 'numpy-float32', 'numpy-batch']:
+        for kwargs in [{}, {'downmix': 'mono'}, {'down_sample': 2}]:
+            assert accuracy(compare_engine('noid3.mp3', engine, 16, **kwargs)) == 'full'
+
+
+if __name__ == '__main__':
+    test_golden_checksums()
+    test_frame_errors()
+    test_engines_full_accuracy()
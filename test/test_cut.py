@@ -0,0 +1,102 @@
+import os
+import tempfile
+
+from cut import MP3Stream, _crc16, _is_tag_frame, concat, cut
+from mp3 import MP3File
+
+SONG = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+
+
+def decode(song: str, start=0, nframes=-1) -> bytes:
+    mp3 = MP3File(song, backend='numpy')
+    if start:
+        mp3.seek(start)
+    mp3.read_frames(nframes)
+    return bytes(mp3.PCM_buffer.buffer)
+
+
+def check_copy(filename: str, start: int, stop: int):
+    # after its first frame, which misses the IMDCT overlap of the frame before, the cut decodes as the original.
+    original = decode(SONG, start, stop - start)
+    copied = decode(filename)
+    frame_bytes = len(original) // (stop - start)
+    assert len(copied) == len(original)
+    assert copied[frame_bytes:] == original[frame_bytes:]
+
+
+def test_cut():
+    stream = MP3Stream(SONG)
+    assert stream.frames[60][2].main_data_begin > 0
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'cut.mp3')
+        cut(SONG, filename, 60, 90)
+        frames = MP3Stream(filename).frames
+        assert len(frames) == 30 and frames[0][2].main_data_begin == 0
+        check_copy(filename, 60, 90)
+        cut(SONG, filename)
+        with open(filename, 'rb') as out:
+            assert out.read() == stream.data[stream.frames[1][0]:]
+
+
+def test_cut_tag_frame():
+    # the Info frame of the song, whose frame count and seek table describe the whole of it, is left out.
+    stream = MP3Stream(SONG)
+    assert stream.tag_frame
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'cut.mp3')
+        cut(SONG, filename, 0, 100)
+        copied = MP3Stream(filename)
+        assert len(copied) == 99 and not copied.tag_frame
+        check_copy(filename, 1, 100)
+
+
+def test_repack_frames():
+    # the main data and reservoir spread over several boundary frames, when one can't hold them.
+    stream = MP3Stream(SONG)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'cut.mp3')
+        with open(filename, 'wb') as out:
+            out.write(b''.join(stream._repack_frames(100, 103, 120)))
+            offset, _, _ = stream.frames[103]
+            end, header, _ = stream.frames[119]
+            out.write(stream.data[offset:end + header.frame_size])
+        check_copy(filename, 100, 120)
+
+
+def test_concat():
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'concat.mp3')
+        concat([(SONG, 10, 20), (SONG, 200, 215), (SONG, 5, 5)], filename)
+        assert len(MP3Stream(filename)) == 25
+        assert len(decode(filename)) == 25 * 4608
+        concat([(SONG, 0, 5), (SONG, 0, 5)], filename)
+        stream = MP3Stream(filename)
+        assert len(stream) == 8 and not any(_is_tag_frame(stream.data, offset, header)
+                                            for offset, header, _ in stream.frames)
+        # silent mono frames: header, empty side info and main data
+        mono = os.path.join(tmp, 'mono.mp3')
+        with open(mono, 'wb') as out:
+            out.write((b'\xff\xfb\x90\xc4' + bytes(413)) * 3)
+        assert len(MP3Stream(mono)) == 3
+        try:
+            concat([(SONG, 10, 20), mono], filename)
+            assert False, "mono and stereo segments"
+        except ValueError:
+            pass
+        try:
+            concat([(SONG, 20, 10)], filename)
+            assert False, "start after stop"
+        except ValueError:
+            pass
+
+
+def test_crc16():
+    assert _crc16(b'123456789') == 0xAEE7
+
+
+if __name__ == '__main__':
+    test_cut()
+    test_cut_tag_frame()
+    test_repack_frames()
+    test_concat()
+    test_crc16()
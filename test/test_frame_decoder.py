@@ -0,0 +1,56 @@
+import numpy as np
+
+from frame_decoder import FrameDecoder
+from mp3 import MP3File
+from util import decode_pcm, song_path
+
+
+def test_reuse_across_files():
+    # 20 frames reach past the near silent start of the songs, into what the buffers carry from frame to frame.
+    for backend in ('reference', 'numpy'):
+        decoder = FrameDecoder(backend=backend)
+        for song in ('noid3.mp3', 'seeusadness.mp3', 'noid3.mp3'):
+            pcm = decode_pcm(song, 20, decoder=decoder)
+            assert np.abs(np.frombuffer(pcm, dtype='<i2')).max() > 1000
+            assert pcm == decode_pcm(song, 20, backend=backend)
+
+
+def test_reset():
+    for backend in ('reference', 'numpy'):
+        decoder = FrameDecoder(backend=backend)
+        MP3File(song_path('noid3.mp3'), decoder=decoder).read_frames(20)
+        buffers = dict(decoder.buffers)
+        overlap, fifo = decoder.state.overlap, decoder.state.fifo
+        assert any(np.any(buffer) for buffer in buffers.values())
+        decoder.reset()
+        # zeroed in place, not allocated again
+        assert all(decoder.buffers[name] is buffer for name, buffer in buffers.items())
+        assert decoder.state.overlap is overlap and decoder.state.fifo is fifo
+        assert not any(np.any(buffer) for buffer in buffers.values())
+        assert not np.any(overlap) and not np.any(fifo)
+
+
+def test_decoder_options():
+    decoder = FrameDecoder(down_sample=2, downmix='mono', backend='numpy', dtype=np.float32)
+    assert decode_pcm('noid3.mp3', 6, decoder=decoder) == \
+        decode_pcm('noid3.mp3', 6, down_sample=2, downmix='mono', dtype=np.float32)
+
+
+def test_output_is_reused():
+    for backend in ('reference', 'numpy'):
+        decoder = FrameDecoder(backend=backend)
+        mp3 = MP3File(song_path('noid3.mp3'), decoder=decoder)
+        mp3.read_frames(1)
+        frame = decoder.frame
+        pcm, scalefac, lines = frame.pcm_output, frame.scalefac_s, frame.frequency_lines[1][0]
+        mp3.read_frames(1)
+        assert decoder.frame is frame
+        assert frame.pcm_output is pcm if backend == 'reference' else np.shares_memory(frame.pcm_output, pcm)
+        assert frame.scalefac_s is scalefac and frame.frequency_lines[1][0] is lines
+
+
+if __name__ == '__main__':
+    test_reuse_across_files()
+    test_reset()
+    test_decoder_options()
+    test_output_is_reused()
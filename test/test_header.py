@@ -1,4 +1,4 @@
-from header import Header, MPEGAudioVersionInfo, LayerInfo, ChannelModeInfo
+from header import Header, MPEGAudioVersionInfo, LayerInfo, ChannelModeInfo, InvalidEncodingError, parse_header
 from pprint import pprint
 
 
@@ -18,4 +18,39 @@ def header_test():
     assert header.channel_mode==ChannelModeInfo.JOINT_STEREO
 
 
-header_test()
\ No newline at end of file
+header_test()
+
+def test_parse_header():
+    word = int('FFFB9064', 16)
+    header = parse_header(word)
+    assert header is parse_header(word)
+    assert header.protection == '1'
+    assert header.padding == '0'
+    assert header.frame_size == 417
+    assert header.samples_per_frame == 1152
+    assert parse_header(word | 1 << 9).frame_size == 418
+    try:
+        header.bitrate = 0
+        assert False, 'header should be immutable'
+    except AttributeError:
+        pass
+    try:
+        parse_header(0xFFF99064)  # reserved layer
+        assert False, 'reserved layer should be rejected'
+    except InvalidEncodingError:
+        pass
+
+
+def test_parse_header_lsf():
+    # MPEG 2 Layer III: its own bitrate table, one granule of 576 samples per frame
+    header = parse_header(0xFFF39064)
+    assert header.MPEG_version == MPEGAudioVersionInfo.TWO
+    assert header.bitrate == 80000
+    assert header.sampling_rate_frequency == 22050
+    assert header.samples_per_frame == 576
+    assert header.frame_size == 261
+    assert parse_header(0xFFE39064).sampling_rate_frequency == 11025  # MPEG 2.5
+    # MPEG 1 Layer I: frames of 4 byte slots
+    header = parse_header(0xFFFF9064)
+    assert header.bitrate == 288000
+    assert (header.frame_size, parse_header(0xFFFF9264).frame_size) == (312, 316)
@@ -0,0 +1,41 @@
+import random
+
+from huffman import decode_big_values, decode_big_values_run, decode_count1_run, decode_quadruples
+from utils.bit import Bit
+
+rng = random.Random(0)
+BITS = ''.join(rng.choice('01') for _ in range(8000))
+
+
+def test_decode_big_values_run():
+    for table_num in [0, 1, 7, 15, 16, 24, 31]:
+        pairs, lines = Bit(BITS), [0.0] * 576
+        for i in range(100, 200, 2):
+            lines[i:i + 2] = map(float, decode_big_values(pairs, table_num))
+        run, run_lines = Bit(BITS), [1.0] * 576
+        decode_big_values_run(run, table_num, run_lines, 100, 200)
+        assert run_lines[100:200] == lines[100:200]
+        assert run_lines[:100] == [1.0] * 100 and run_lines[200:] == [1.0] * 376
+        assert run.get_pointer() == pairs.get_pointer()
+
+
+def test_decode_count1_run():
+    lines = [0.0] * 576
+    end = decode_count1_run(Bit(BITS), 33, lines, 0, 100)
+    # table 33 codes every quadruple with 4 bits, plus one sign bit per non-zero value.
+    quads, expected, bits = 0, [], Bit(BITS)
+    while bits.get_pointer() < 100:
+        quad = decode_quadruples(bits, 33)
+        if bits.get_pointer() > 100:
+            break
+        expected += map(float, quad)
+        quads += 1
+    assert end == 4 * quads
+    assert lines[:end] == expected and lines[end:] == [0.0] * (576 - end)
+    # stops at 576 lines
+    assert decode_count1_run(Bit(BITS), 32, [0.0] * 576, 560, 8000) == 576
+
+
+if __name__ == '__main__':
+    test_decode_big_values_run()
+    test_decode_count1_run()
@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+
+from main_data import nonzero_bound, scale_factor_plan
+from mp3 import MP3File
+
+
+def test_nonzero_bound():
+    assert nonzero_bound([0] * 576) == 0
+    lines = [0] * 576
+    lines[3] = 2.0
+    lines[40] = -1.0
+    assert nonzero_bound(lines) == 41
+    lines[575] = 1.0
+    assert nonzero_bound(lines) == 576
+
+
+def test_scale_factor_plan():
+    # scalefac_compress 15: slen1 4, slen2 3
+    assert scale_factor_plan(15, False, False) == (('l', 0, 11, 4), ('l', 11, 10, 3))
+    assert scale_factor_plan(15, True, False) == (('s', 0, 6, 4), ('s', 6, 6, 3))
+    assert scale_factor_plan(15, True, True) == (('l', 0, 8, 4), ('s', 3, 3, 4), ('s', 6, 6, 3))
+    assert scale_factor_plan(15, False, False, (0, 0, 0, 0)) == (('l', 0, 11, 4), ('l', 11, 10, 3))
+    assert scale_factor_plan(15, False, False, (1, 1, 0, 1)) == (
+        ('reuse', 0, 11, 4), ('l', 11, 5, 3), ('reuse', 16, 5, 3))
+
+
+def test_short_blocks():
+    # frame 14 (zero based) is the first one with short blocks, every band of them has scale factors.
+    mp3 = MP3File(os.path.join(os.path.dirname(__file__), 'noid3.mp3'), profile=True)
+    mp3.read_frames(16)
+    assert mp3.stats()['frames'] == 16
+
+
+def test_decoder_state():
+    # overlap and synthesis FIFO carry over from one read to the next, output doesn't depend on where reads stop.
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    whole = MP3File(song_path, backend='numpy')
+    whole.read_frames(18)
+    parts = MP3File(song_path, backend='numpy')
+    parts.read_frames(15)
+    parts.read_frames(3)
+    assert parts.PCM_buffer.buffer == whole.PCM_buffer.buffer
+    state = parts.decoder_state
+    assert np.abs(state.fifo).max() > 0
+    state.reset()
+    assert np.abs(state.fifo).max() == 0 and np.abs(state.overlap).max() == 0 and state.active == [0, 0]
+
+
+if __name__ == '__main__':
+    test_nonzero_bound()
+    test_scale_factor_plan()
+    test_short_blocks()
+    test_decoder_state()
@@ -0,0 +1,32 @@
+import numpy as np
+
+import util
+
+# both bundled songs hold the same audio frames, the first 15 frames are near silence
+SONG = 'noid3.mp3'
+NFRAMES = 40
+
+
+def decode_pcm(song, nframes=NFRAMES, **kwargs) -> np.ndarray:
+    return np.frombuffer(util.decode_pcm(song, nframes, **kwargs), dtype='<i2').astype(int)
+
+
+def test_float64_matches_reference():
+    reference = decode_pcm(SONG)
+    assert np.abs(reference).max() > 1000
+    assert np.array_equal(decode_pcm(SONG, dtype=np.float64), reference)
+
+
+def test_float32_accuracy():
+    # float32 output should stay within 1 LSB of the int16 float64 reference.
+    for kwargs in [{}, {'downmix': 'mono'}, {'down_sample': 2}]:
+        reference = decode_pcm(SONG, **kwargs)
+        output = decode_pcm(SONG, dtype=np.float32, **kwargs)
+        assert np.abs(reference).max() > 1000
+        assert output.shape == reference.shape
+        assert np.abs(output - reference).max() <= 1
+
+
+if __name__ == '__main__':
+    test_float64_matches_reference()
+    test_float32_accuracy()
@@ -1,3 +1,7 @@
+import os
+import subprocess
+import sys
+
 from header import Header
 from main_data import MainData
 from mp3 import MP3File
@@ -85,6 +89,189 @@ def mp3_test():
     mp3.save_as_wav('hello.wav')
 
 
+def decode_samples(song_path: str, nframes: int, **kwargs):
+    # the decoder and its PCM as a (samples, channels) array
+    import numpy as np
+    mp3 = MP3File(song_path, **kwargs)
+    mp3.read_frames(nframes)
+    return mp3, np.frombuffer(bytes(mp3.PCM_buffer.buffer), dtype='<i2').reshape(-1, mp3.PCM_buffer.nchannels).astype(float)
+
+def test_down_sample():
+    # the reduced synthesis gives the full rate decode low-passed to its new Nyquist frequency and decimated.
+    # 40 frames, the first 15 are near silence.
+    import numpy as np
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    full, samples = decode_samples(song_path, 40, profile=True)
+    assert np.abs(samples).max() > 1000
+    for down_sample in (2, 4):
+        mp3, decimated = decode_samples(song_path, 40, down_sample=down_sample, profile=True)
+        # Huffman decoding stops at the synthesized subbands
+        assert mp3.stats()['huffman_symbols'] < full.stats()['huffman_symbols']
+        assert decimated.shape == (len(samples) // down_sample, 2)
+        assert mp3.PCM_buffer.framerate == full.PCM_buffer.framerate // down_sample
+        spectrum = np.fft.rfft(samples, axis=0)
+        spectrum[len(samples) // (2 * down_sample):] = 0
+        low_passed = np.fft.irfft(spectrum, len(samples), axis=0)[::down_sample]
+        assert np.corrcoef(low_passed.ravel(), decimated.ravel())[0, 1] > 0.9999
+
+def test_downmix():
+    # the frequency domain mix is the average of the channels, up to the rounding of both.
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    stereo, stereo_samples = decode_samples(song_path, 40)
+    mono, mono_samples = decode_samples(song_path, 40, downmix='mono')
+    assert stereo.PCM_buffer.nchannels == 2
+    assert mono.PCM_buffer.nchannels == 1
+    assert len(mono_samples) == len(stereo_samples)
+    assert abs(stereo_samples).max() > 1000
+    assert abs(mono_samples[:, 0] - stereo_samples.mean(axis=1)).max() <= 0.5
+
+def test_profile():
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    assert MP3File(song_path).stats() is None
+    mp3 = MP3File(song_path, profile=True)
+    mp3.read_frames(2)
+    stats = mp3.stats()
+    assert stats['frames'] == 2
+    assert stats['bits'] > 0 and stats['huffman_symbols'] > 0
+    for stage in ['framing', 'unpack_scale_factors', 'unpack_huffman', 'requantization', 'aliasing_reduction',
+                  'IMDCT', 'frequency_inversion', 'synthesis', 'pcm_output']:
+        assert stats['stage_ns'][stage] > 0
+    # only the 8 decoded subbands per granule and channel count when quarter rate drops the others
+    mp3 = MP3File(song_path, profile=True, down_sample=4)
+    mp3.read_frames(2)
+    assert 0 < mp3.stats()['zero_bands_skipped'] <= 2 * 2 * 2 * 8
+
+def test_batch():
+    # batched transforms give the same PCM as frame by frame decoding, the last batch may be partial.
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    for kwargs in [{}, {'downmix': 'mono'}, {'down_sample': 2}]:
+        frames = MP3File(song_path, backend='numpy', **kwargs)
+        frames.read_frames(18)
+        batched = MP3File(song_path, backend='numpy', batch=4, profile=True, **kwargs)
+        batched.read_frames(18)
+        assert batched.PCM_buffer.buffer == frames.PCM_buffer.buffer
+        assert batched.stats()['frames'] == 18
+    assert MP3File(song_path, backend={'imdct': 'numpy', 'synthesis': 'accelerated'}, batch=4).batch == 4
+    for backend in ['reference', {'huffman': 'numpy', 'synthesis': 'numpy'}, {'imdct': 'numpy'},
+                    {'imdct': 'reference', 'synthesis': 'numpy', 'requantization': 'numpy'}]:
+        try:
+            MP3File(song_path, backend=backend, batch=4)
+            assert False, "batch needs the numpy imdct and synthesis stages"
+        except ValueError:
+            pass
+
+def test_batch_error():
+    # a batch whose transforms fail is not transformed again while the error propagates.
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    mp3 = MP3File(song_path, backend='numpy', batch=4)
+    batches = []
+    def transform_batch(frames):
+        batches.append(len(frames))
+        raise RuntimeError("transform failed")
+    mp3._transform_batch = transform_batch
+    try:
+        mp3.read_frames(10)
+        assert False, "the error should propagate"
+    except RuntimeError:
+        pass
+    assert batches == [4]
+
+def test_pipeline():
+    # entropy decoding in a second thread gives the same PCM, also when read_frames stops and continues.
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    results = []
+    for kwargs in [{}, {'pipeline': 2}, {'pipeline': 8, 'batch': 5}]:
+        mp3 = MP3File(song_path, backend='numpy', **kwargs)
+        mp3.read_frames(8)
+        mp3.read_frames(23)
+        results.append((bytes(mp3.PCM_buffer.buffer), mp3.position))
+    assert results[1] == results[0] and results[2] == results[0]
+
+def test_read_spectra():
+    # spectra are the frequency lines the transforms would start from, without touching the PCM buffer.
+    # 20 frames, the lines only grow above 1e-3 after frame 15.
+    import numpy as np
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    reference = np.array(list(MP3File(song_path).read_spectra(20)))
+    assert reference.shape == (40, 2, 576)
+    peak = abs(reference).max()
+    assert peak > 1e-2
+    for kwargs in [{'backend': 'numpy'}, {'backend': 'numpy', 'pipeline': 2}]:
+        mp3 = MP3File(song_path, **kwargs)
+        spectra = np.array(list(mp3.read_spectra(20)))
+        assert spectra.shape == reference.shape
+        assert abs(spectra - reference).max() <= 1e-9 * peak
+        assert len(mp3.PCM_buffer.buffer) == 0
+    mono = np.array(list(MP3File(song_path, backend='numpy', downmix='mono').read_spectra(20)))
+    assert mono.shape == (40, 1, 576)
+    assert abs(mono[:, 0] - reference.mean(axis=1)).max() <= 1e-9 * peak
+    # down sampling by 4 keeps the lines of the lower 8 subbands, the others aren't decoded.
+    quarter = np.array(list(MP3File(song_path, down_sample=4).read_spectra(20)))
+    assert abs(reference[:, :, 144:]).max() > 0
+    assert not quarter[:, :, 144:].any()
+    assert abs(quarter[:, :, :144] - reference[:, :, :144]).max() <= 1e-9 * peak
+
+def test_seek():
+    # decoding after seek gives the same PCM as decoding from the start.
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    full = MP3File(song_path, backend='numpy')
+    full.read_frames(40)
+    frame_bytes = len(full.PCM_buffer.buffer) // 40
+    for frame in [0, 1, 30]:
+        mp3 = MP3File(song_path, backend='numpy')
+        mp3.read_frames(3)
+        mp3.seek(frame)
+        mp3.read_frames(10)
+        assert mp3.PCM_buffer.buffer[3 * frame_bytes:] == full.PCM_buffer.buffer[frame * frame_bytes:(frame + 10) * frame_bytes]
+    assert len(mp3.frame_index()) == 8454
+
+def test_peaks():
+    import numpy as np
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    full = MP3File(song_path, backend='numpy')
+    full.read_frames(40)
+    samples = np.frombuffer(bytes(full.PCM_buffer.buffer), dtype='<i2').reshape(8, -1) / 32768
+    mp3 = MP3File(song_path, backend='numpy')
+    for start in [0, 20]:
+        peaks = mp3.peaks(4, start=start, stop=start + 20)
+        expected = samples[start // 5:start // 5 + 4]
+        assert abs(peaks[:, 0] - expected.min(axis=1)).max() < 1e-4
+        assert abs(peaks[:, 1] - expected.max(axis=1)).max() < 1e-4
+    assert mp3.position == MP3File(song_path).position
+    approximate = mp3.peaks(4, 'approximate', stop=20)
+    assert approximate.shape == (4, 2) and (approximate[:, 0] <= approximate[:, 1]).all()
+    # more buckets than samples: the empty ones are 0
+    sparse = mp3.peaks(2000, start=10, stop=11)
+    assert ((sparse[:, 0] < sparse[:, 1]) | (sparse == 0).all(axis=1)).all()
+    assert (sparse == 0).all(axis=1).sum() >= 2000 - 1152
+
+def test_sinks():
+    # every sink receives the samples of the PCM buffer, the .npy sized to the stream by a header scan.
+    import tempfile
+    import numpy as np
+    from PCM import ArraySink, NpySink
+    song_path = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+    mp3 = MP3File(song_path, backend='numpy')
+    mp3.read_frames(20)
+    expected = np.frombuffer(bytes(mp3.PCM_buffer.buffer), dtype='<i2').reshape(-1, 2)
+    assert mp3.length() == (8454 - 20) * 1152
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'out.npy')
+        for sink in [ArraySink(), NpySink(filename)]:
+            mp3 = MP3File(song_path, backend='numpy', sink=sink)
+            assert sink.length == 8454 * 1152
+            mp3.read_frames(20)
+            assert (sink.array == expected).all()
+        sink.close()
+        assert np.load(filename, mmap_mode='r').shape == (8454 * 1152, 2)
+
+def test_import_is_lazy():
+    # numpy and the numpy backend are only imported once a frame is decoded.
+    code = 'import sys, mp3; print("numpy" in sys.modules, "main_data_numpy" in sys.modules)'
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.dirname(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    assert output.split() == ['False', 'False']
+
 
 if __name__=='__main__':
     # frame_test()
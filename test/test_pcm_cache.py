@@ -0,0 +1,95 @@
+import os
+import tempfile
+
+import numpy as np
+
+import pcm_cache
+from mp3 import MP3File
+from pcm_cache import PCMCache, audio_frames
+from util import song_path
+
+
+def test_key():
+    cache = PCMCache(tempfile.mkdtemp())
+    # the same frames with and without an ID3 tag
+    assert audio_frames(song_path('seeusadness.mp3')) == audio_frames(song_path('noid3.mp3'))
+    assert cache.key(song_path('seeusadness.mp3')) == cache.key(song_path('noid3.mp3'))
+    assert cache.key(song_path('noid3.mp3')) == cache.key(song_path('noid3.mp3'), backend='reference', pipeline=4)
+    assert cache.key(song_path('noid3.mp3'), dtype=np.float32) == cache.key(song_path('noid3.mp3'),
+                                                                          backend='numpy', dtype='float32')
+    assert cache.key(song_path('noid3.mp3')) != cache.key(song_path('noid3.mp3'), down_sample=2)
+    assert cache.key(song_path('noid3.mp3')) != cache.key(song_path('new_mp3.mp3'))
+    # a decoder or sink would decode with options the key doesn't see
+    for option in ['decoder', 'sink']:
+        try:
+            cache.decode(song_path('noid3.mp3'), **{option: None})
+            assert False, "%s can't be cached" % option
+        except ValueError:
+            pass
+
+
+def test_decode():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PCMCache(tmp)
+        options = {'down_sample': 4, 'downmix': 'mono', 'backend': 'accelerated'}
+        samples = cache.decode(song_path('noid3.mp3'), **options)
+        mp3 = MP3File(song_path('noid3.mp3'), **options)
+        mp3.read_frames(50)
+        expected = np.frombuffer(bytes(mp3.PCM_buffer.buffer), dtype='<i2').reshape(-1, 1)
+        assert isinstance(samples, np.memmap) and samples.shape == (8454 * 288, 1)
+        assert (samples[:len(expected)] == expected).all()
+        assert os.listdir(tmp) == [os.path.basename(cache.path(song_path('noid3.mp3'), **options))]
+
+        # hits of the same audio don't decode
+        decoder = pcm_cache.MP3File
+        pcm_cache.MP3File = None
+        try:
+            again = cache.decode(song_path('seeusadness.mp3'), **options)
+        finally:
+            pcm_cache.MP3File = decoder
+        assert again.filename == cache.path(song_path('noid3.mp3'), **options)
+        assert again.shape == samples.shape
+
+
+def test_short_decode():
+    # a decode which stops before the end of the stream leaves neither an entry nor its temporary file
+    class Interrupted(MP3File):
+        def read_frames(self, nframes=-1):
+            super().read_frames(10)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PCMCache(tmp)
+        pcm_cache.MP3File = Interrupted
+        try:
+            cache.decode(song_path('noid3.mp3'), backend='numpy')
+            assert False, "the decode is short"
+        except ValueError:
+            pass
+        finally:
+            pcm_cache.MP3File = MP3File
+        assert os.listdir(tmp) == []
+
+
+def test_evict():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PCMCache(tmp, max_bytes=250)
+        for num in range(3):
+            path = os.path.join(tmp, '%d.npy' % num)
+            with open(path, 'wb') as entry:
+                entry.write(bytes(100))
+            os.utime(path, (num, num))
+        for name in ['writing.tmp', 'crashed.tmp']:
+            with open(os.path.join(tmp, name), 'wb') as entry:
+                entry.write(bytes(1000))
+        os.utime(os.path.join(tmp, 'crashed.tmp'), (0, 0))
+        os.utime(os.path.join(tmp, '0.npy'), (10, 10))
+        cache.evict()
+        # 0.npy was used last, the file being written isn't an entry, the one of a crashed worker is removed
+        assert sorted(os.listdir(tmp)) == ['0.npy', '2.npy', 'writing.tmp']
+
+
+if __name__ == '__main__':
+    test_key()
+    test_decode()
+    test_short_decode()
+    test_evict()
@@ -0,0 +1,48 @@
+import threading
+
+from utils.pipeline import threaded
+
+
+def test_threaded():
+    assert list(threaded(range(100), 3)) == list(range(100))
+    assert list(threaded([], 1)) == []
+
+
+def test_threaded_error():
+    def items():
+        yield 1
+        yield 2
+        raise KeyError('bad frame')
+
+    received = []
+    try:
+        for item in threaded(items(), 1):
+            received.append(item)
+        assert False, "the producer's error is raised in the consumer"
+    except KeyError:
+        pass
+    assert received == [1, 2]
+
+
+def test_threaded_close():
+    closed = threading.Event()
+
+    def items():
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            closed.set()
+
+    frames = threaded(items(), 2)
+    assert next(frames) == 0
+    frames.close()
+    # closing the consumer side stops the producer thread and closes its generator.
+    assert closed.is_set()
+    assert not any(thread.name == 'pipeline' for thread in threading.enumerate())
+
+
+if __name__ == '__main__':
+    test_threaded()
+    test_threaded_error()
+    test_threaded_close()
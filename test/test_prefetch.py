@@ -0,0 +1,66 @@
+import os
+import threading
+
+from mp3 import MP3File
+from utils.prefetch import PrefetchReader
+
+SONG = os.path.join(os.path.dirname(__file__), 'noid3.mp3')
+
+
+def reading_threads() -> int:
+    return sum(thread.name == 'pipeline' for thread in threading.enumerate())
+
+
+def test_read():
+    with open(SONG, 'rb') as audio:
+        data = audio.read()
+    for block_size, length in [(1, 20000), (1000, len(data)), (1 << 20, len(data))]:
+        with PrefetchReader(SONG, block_size, 2) as reader:
+            chunks = []
+            while reader.tell() < length:
+                assert reader.tell() == sum(map(len, chunks))
+                assert reader.peek(3) == data[reader.tell():reader.tell() + 3]
+                chunk = reader.read(4097)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            assert b''.join(chunks) == data[:reader.tell()]
+            if length == len(data):
+                assert reader.read(1) == b'' and reader.peek() == b''
+    assert reading_threads() == 0
+
+
+def test_seek():
+    with open(SONG, 'rb') as audio:
+        data = audio.read()
+    with PrefetchReader(SONG, 4096) as reader:
+        reader.read(5000)
+        # back over a few bytes stays in the blocks at hand, far away reads again from there
+        for position in [4998, 3000000, 10, len(data) - 3, len(data) + 5]:
+            reader.seek(position)
+            assert reader.tell() == position
+            assert reader.read(8) == data[position:position + 8]
+    # started at a position, seeking there keeps the thread reading ahead
+    with PrefetchReader(SONG, 4096, position=3000) as reader:
+        blocks = reader._blocks
+        reader.seek(3000)
+        assert reader._blocks is blocks
+        assert reader.read(8) == data[3000:3008]
+    assert reading_threads() == 0
+
+
+def test_mp3_prefetch():
+    plain = MP3File(SONG, backend='numpy')
+    plain.read_frames(30)
+    prefetched = MP3File(SONG, backend='numpy', prefetch=1000)
+    prefetched.read_frames(10)
+    prefetched.read_frames(20)
+    assert prefetched.PCM_buffer.buffer == plain.PCM_buffer.buffer
+    assert prefetched.position == plain.position
+    assert reading_threads() == 0
+
+
+if __name__ == '__main__':
+    test_read()
+    test_seek()
+    test_mp3_prefetch()
@@ -1,23 +1,22 @@
 from header import ChannelModeInfo
 from side_info import SideInfo
-from pprint import pprint
 
 expected_result={
     'main_data_begin':0,
     'private_bits':0,
-    'scfsi':[['1', '1', '1', '1'], ['0', '1', '1', '1']],
+    'scfsi':[[1, 1, 1, 1], [0, 1, 1, 1]],
     'part2_3_length':806,
     'big_values':83,
     'global_gain':110,
     'scalefac_compress':0,
     'windows_switching_flag':False,
-    'table_select':[1,1,3],
-    'subblock_gain':[0,0,0],
+    'table_select':(1,1,3),
+    'subblock_gain':(0,0,0),
     'region0_count':4,
     'region1_count':6,
     'preflag':False,
-    'scalefac_scale':'0',
-    'count1table_select':'1'
+    'scalefac_scale':0,
+    'count1table_select':1
 
 }
 
@@ -30,10 +29,9 @@ def sideinfo_test():
     bytes_str = bin(int(raw,16))[2:]
     bytes_str = '0'*(num_bytes*8-len(bytes_str))+bytes_str
     side_info = SideInfo(bytes_str,ChannelModeInfo.JOINT_STEREO)
-    pprint(vars(side_info))
-    pprint(vars(side_info.granules[0].channels[0]))
-    pprint(vars(side_info.granules[0].channels[1]))
-    # pprint(vars(side_info.granules[1]))
+    print(side_info.granules[0].channels[0])
+    print(side_info.granules[0].channels[1])
+    # print(side_info.granules[1])
 
     assert side_info.main_data_begin==expected_result['main_data_begin']
     assert side_info.scfsi==expected_result['scfsi']
@@ -0,0 +1,17 @@
+'''
+helpers shared by the test modules.
+'''
+import os
+
+from mp3 import MP3File
+
+
+def song_path(song: str) -> str:
+    return os.path.join(os.path.dirname(__file__), song)
+
+
+def decode_pcm(song, nframes, **kwargs) -> bytes:
+    # the PCM of the first nframes frames of a bundled song
+    mp3 = MP3File(song_path(song), **kwargs)
+    mp3.read_frames(nframes)
+    return bytes(mp3.PCM_buffer.buffer)
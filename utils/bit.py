@@ -49,7 +49,62 @@ class Bit:
         return len(self.__bits)
 
     def set_pointer(self, idx):
-        if not self._check_valid_index(idx):
+        # the end of the bits is a valid position, nothing is left to read there.
+        if idx > len(self.__bits):
+            raise IndexError
+        self.__pointer = idx
+
+
+class IntBit:
+    '''
+    bits kept in one integer, read with shifts and masks instead of slicing strings.
+    Provides the reading interface of Bit.
+    '''
+
+    __slots__ = ('__value', '__length', '__pointer')
+
+    def __init__(self, data=b'', length=None, pointer=0):
+        '''
+        data: bytes, or an integer holding `length` bits.
+        '''
+        if isinstance(data, (bytes, bytearray)):
+            length = len(data) * 8
+            data = int.from_bytes(data, byteorder='big', signed=False)
+        self.__value = data
+        self.__length = length
+        self.__pointer = pointer
+
+    def peek(self, num=1):
+        if self.__pointer + num > self.__length:
+            raise IndexError("invalid number of bits to peek.")
+        return format(self._get(num), '0%db' % num) if num else ''
+
+    def read(self, num=1):
+        return format(self.read_as_int(num), '0%db' % num) if num else ''
+
+    def read_as_int(self, num: int) -> int:
+        '''
+        read a number of bits and translate into 10-based integer.
+        '''
+        if self.__pointer + num > self.__length:
+            raise IndexError("Invalid number of bits to read. \n"
+                             "Current pointer at: %d, total length is %d, number wants to read are: %d"
+                             % (self.__pointer, self.__length, num))
+        value = self._get(num)
+        self.__pointer += num
+        return value
+
+    def _get(self, num):
+        return (self.__value >> (self.__length - self.__pointer - num)) & ((1 << num) - 1)
+
+    def get_pointer(self):
+        return self.__pointer
+
+    def get_length(self):
+        return self.__length
+
+    def set_pointer(self, idx):
+        if idx > self.__length:
             raise IndexError
         self.__pointer = idx
 
@@ -0,0 +1,42 @@
+'''
+loggers of the decoder subsystems. Tracing is off by default: every trace in the decoder is guarded by
+isEnabledFor(logging.DEBUG), so no message is formatted unless its subsystem is enabled.
+'''
+import logging
+import sys
+
+framing_logger = logging.getLogger('pydemp3.framing')
+side_info_logger = logging.getLogger('pydemp3.side_info')
+huffman_logger = logging.getLogger('pydemp3.huffman')
+synthesis_logger = logging.getLogger('pydemp3.synthesis')
+
+SUBSYSTEMS = {
+    'framing': framing_logger,
+    'side_info': side_info_logger,
+    'huffman': huffman_logger,
+    'synthesis': synthesis_logger,
+}
+
+# library default: no output unless the application configures logging.
+logging.getLogger('pydemp3').addHandler(logging.NullHandler())
+
+# the handler of the last enable_tracing call
+_trace_handler = None
+
+
+def enable_tracing(*subsystems, level=logging.DEBUG, stream=sys.stderr):
+    '''
+    print traces of the given subsystems (all of them by default) to stream. A later call replaces the
+    stream of an earlier one, traces don't propagate to the handlers of the root logger.
+    '''
+    global _trace_handler
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(name)s: %(message)s'))
+    for logger in SUBSYSTEMS.values():
+        logger.removeHandler(_trace_handler)
+    _trace_handler = handler
+    for name in subsystems or SUBSYSTEMS:
+        logger = SUBSYSTEMS[name]
+        logger.setLevel(level)
+        logger.propagate = False
+        logger.addHandler(handler)
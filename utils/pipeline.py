@@ -0,0 +1,63 @@
+'''
+pipelined decoding: a producer thread runs a generator ahead of its consumer through a bounded queue.
+'''
+import queue
+import threading
+
+# end of the produced items
+_DONE = object()
+
+
+class _Failure:
+    '''
+    an exception raised by the producer, raised again in the consumer after the items before it.
+    '''
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def threaded(items, depth: int):
+    '''
+    generator of the items of the iterable items, which is iterated in a separate thread at most
+    depth items ahead. Closing the generator stops the thread, and closes items if it is a generator.
+    '''
+    buffer = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # waits for room in the buffer unless the consumer went away.
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    break
+            else:
+                put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            if hasattr(items, 'close'):
+                items.close()
+
+    thread = threading.Thread(target=produce, name='pipeline', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,86 @@
+'''
+read-ahead file reader: a background thread reads large blocks ahead of the framer, see MP3File(prefetch=...).
+'''
+from utils.pipeline import threaded
+
+# bytes kept before the read position, so that the framer can step back over a frame sync
+_LOOKBEHIND = 16
+
+
+class PrefetchReader(object):
+    """
+    the read, peek, seek and tell of a buffered binary file, served from blocks of block_size bytes
+    which a thread reads up to depth blocks ahead, from position on. Seeking outside the bytes at hand
+    drops the blocks read ahead and starts reading at the new position.
+    """
+
+    def __init__(self, filename: str, block_size=1 << 20, depth=4, position=0):
+        if block_size < 1 or depth < 1:
+            raise ValueError("block_size and depth should be positive")
+        self.block_size = block_size
+        self.depth = depth
+        self._file = open(filename, 'rb')
+        self._blocks = None
+        self.seek(position)
+
+    def read(self, size: int) -> bytes:
+        self._fill(size)
+        data = self._buffer[self._pointer:self._pointer + size]
+        self._pointer += len(data)
+        return data
+
+    def peek(self, size=1) -> bytes:
+        '''
+        the next size bytes without reading them, fewer at the end of the file.
+        '''
+        self._fill(size)
+        return self._buffer[self._pointer:self._pointer + size]
+
+    def tell(self) -> int:
+        return self._offset + self._pointer
+
+    def seek(self, position: int):
+        if self._blocks is not None and self._offset <= position <= self._offset + len(self._buffer):
+            self._pointer = position - self._offset
+            return
+        self._stop()
+        self._buffer = b''
+        self._offset = position
+        self._pointer = 0
+        self._blocks = threaded(_read_blocks(self._file, position, self.block_size), self.depth)
+
+    def close(self):
+        self._stop()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _fill(self, size: int):
+        # append blocks until size bytes follow the read position, or the file ends
+        while len(self._buffer) - self._pointer < size:
+            block = next(self._blocks, None)
+            if block is None:
+                return
+            keep = max(self._pointer - _LOOKBEHIND, 0)
+            self._buffer = self._buffer[keep:] + block
+            self._offset += keep
+            self._pointer -= keep
+
+    def _stop(self):
+        # the reading thread ends before the file is used again
+        if self._blocks is not None:
+            self._blocks.close()
+            self._blocks = None
+
+
+def _read_blocks(audio, position: int, block_size: int):
+    audio.seek(position)
+    while True:
+        block = audio.read(block_size)
+        if not block:
+            return
+        yield block
@@ -0,0 +1,64 @@
+'''
+optional decoding instrumentation: cumulative time of every decoding stage and a few counters.
+'''
+from time import perf_counter_ns
+
+
+class DecodeStats:
+    '''
+    stage_ns: cumulative perf_counter_ns time per stage, in the order stages were first seen.
+    frames: decoded frames.
+    bits: main data bits consumed by scale factors and Huffman codes.
+    huffman_symbols: decoded big value pairs and count1 quadruples.
+    zero_bands_skipped: subbands IMDCT skipped because all their frequency lines are zero.
+    '''
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stage_ns = {}
+        self.frames = 0
+        self.bits = 0
+        self.huffman_symbols = 0
+        self.zero_bands_skipped = 0
+
+    def add_stage_time(self, stage: str, ns: int):
+        self.stage_ns[stage] = self.stage_ns.get(stage, 0) + ns
+
+    def time_stage(self, stage):
+        '''
+        run stage (a bound method of a decoding stage) and add its time.
+        '''
+        start = perf_counter_ns()
+        result = stage()
+        self.add_stage_time(stage.__name__, perf_counter_ns() - start)
+        return result
+
+    def count_frame(self, main_data):
+        self.frames += 1
+        self.bits += main_data.bits_consumed
+        self.huffman_symbols += main_data.huffman_symbols
+        self.zero_bands_skipped += main_data.zero_subbands()
+
+    def as_dict(self) -> dict:
+        return {
+            'frames': self.frames,
+            'bits': self.bits,
+            'huffman_symbols': self.huffman_symbols,
+            'zero_bands_skipped': self.zero_bands_skipped,
+            'stage_ns': dict(self.stage_ns),
+        }
+
+    def report(self) -> str:
+        '''
+        stage breakdown as a printable table.
+        '''
+        total = sum(self.stage_ns.values()) or 1
+        lines = ['%-22s %12s %7s' % ('stage', 'time (ms)', 'share')]
+        for stage, ns in self.stage_ns.items():
+            lines.append('%-22s %12.3f %6.1f%%' % (stage, ns / 1e6, 100 * ns / total))
+        lines.append('%-22s %12.3f' % ('total', sum(self.stage_ns.values()) / 1e6))
+        lines.append('frames: %d, bits: %d, huffman symbols: %d, zero bands skipped: %d'
+                     % (self.frames, self.bits, self.huffman_symbols, self.zero_bands_skipped))
+        return '\n'.join(lines)
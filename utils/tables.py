@@ -0,0 +1,80 @@
+'''
+precomputed tables of the NumPy decoding stages. Nothing is computed at import time: every table is
+built on its first use and cached, so short-lived workers only pay for the tables they touch.
+All of them take well under a millisecond to build, less than loading them from a file would.
+'''
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from main_data import ALIAS_CA, ALIAS_CS
+from side_info import BlockTypeInfo
+from utils import sythesis_coefficients
+
+# largest quantized value: 15 plus 13 linbits
+MAX_QUANTIZED = 15 + (1 << 13) - 1
+
+# lines below (LO) and above (HI) every subband boundary 1..31 taking part in its 8 alias butterflies
+ALIAS_LO = 18 * np.arange(1, 32).reshape(-1, 1) - 1 - np.arange(8)
+ALIAS_HI = 18 * np.arange(1, 32).reshape(-1, 1) + np.arange(8)
+
+
+@lru_cache(maxsize=None)
+def pow43(dtype) -> np.ndarray:
+    '''
+    i ** (4/3) for every quantized value i, in the given dtype.
+    '''
+    return (np.arange(MAX_QUANTIZED + 1, dtype=np.float64) ** (4 / 3)).astype(dtype)
+
+
+@lru_cache(maxsize=None)
+def alias_tables(dtype) -> tuple:
+    '''
+    cs and ca butterfly coefficients of MainData.aliasing_reduction, in the given dtype.
+    '''
+    return np.array(ALIAS_CS, dtype=dtype), np.array(ALIAS_CA, dtype=dtype)
+
+
+@lru_cache(maxsize=None)
+def imdct_tables(dtype) -> dict:
+    '''
+    IMDCT cosine matrices and window shapes of MainData, in the given dtype.
+    '''
+    long_window = np.array([math.sin((i + 0.5) * math.pi / 36) for i in range(36)])
+    start_window = np.zeros(36)
+    start_window[:18] = long_window[:18]
+    start_window[18:24] = 1
+    start_window[24:30] = [math.sin((i - 17.5) * math.pi / 12) for i in range(24, 30)]
+    end_window = np.zeros(36)
+    end_window[6:12] = [math.sin((i - 5.5) * math.pi / 12) for i in range(6, 12)]
+    end_window[12:18] = 1
+    end_window[18:] = long_window[18:]
+    return {
+        'long': imdct_matrix(36).astype(dtype),
+        'short': imdct_matrix(12).astype(dtype),
+        'long_windows': {
+            BlockTypeInfo.FORBIDDEN: long_window.astype(dtype),
+            BlockTypeInfo.START: start_window.astype(dtype),
+            BlockTypeInfo.END: end_window.astype(dtype),
+        },
+        'short_window': np.array([math.sin((i + 0.5) * math.pi / 12) for i in range(12)], dtype=dtype),
+    }
+
+
+def imdct_matrix(n):
+    i = np.arange(n).reshape(-1, 1)
+    k = np.arange(n // 2).reshape(1, -1)
+    return np.cos(math.pi / (2 * n) * (2 * i + 1 + n / 2) * (2 * k + 1))
+
+
+@lru_cache(maxsize=None)
+def synthesis_tables(subbands, dtype) -> tuple:
+    '''
+    N-2N DCT matrix and decimated synthesis window of MainData.synthesis for N subbands, in the given dtype.
+    '''
+    i = np.arange(2 * subbands).reshape(-1, 1)
+    k = np.arange(subbands).reshape(1, -1)
+    dct = np.cos((subbands // 2 + i) * (2 * k + 1) * math.pi / (2 * subbands))
+    window = np.array(sythesis_coefficients.D[::32 // subbands])
+    return dct.astype(dtype), window.astype(dtype)